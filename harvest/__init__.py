@@ -26,5 +26,7 @@ from .harvest import *
 
 __all__ = [
     '__author__', '__copyright__', '__email__', '__license__',
-    '__maintainer__', '__version__', 'harvest', 'harvestdataclasses', 'reports'
+    '__maintainer__', '__version__', 'harvest', 'harvestdataclasses', 'reports',
+    'asyncharvest', 'cache', 'codecs', 'columnar', 'decoders', 'export', 'ratelimit',
+    'retry', 'slotteddataclasses', 'transfer'
 ]
@@ -0,0 +1,127 @@
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import copy
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+
+from .harvest import Harvest, page_value
+
+class AsyncHarvest(object):
+    """asyncio front end to Harvest.
+
+    Every public Harvest method is available as a coroutine of the same name
+    and signature, the iter_ methods as async generators. Calls are run on a
+    worker pool sized to the connection pool of a single wrapped Harvest
+    client so they share its connections, rate limiting and dataclasses.
+    Fan out with asyncio.gather."""
+
+    def __init__(self, uri, auth, max_workers=Harvest.POOL_MAXSIZE, **kwargs):
+        kwargs.setdefault('pool_maxsize', max_workers)
+        self.__harvest = Harvest(uri, auth, **kwargs)
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers)
+        # copies from with_response_format share the pool and the session
+        self.__owner = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    # waits for running calls on another thread so the event loop isn't blocked.
+    # Only the client which made them closes the pool and the session.
+    async def close(self):
+        if not self.__owner:
+            return
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self.__executor.shutdown, wait=True))
+        self.__harvest.close()
+
+    # A client sharing this one's worker pool and Harvest client's connections,
+    # which returns responses in another format. Not a coroutine, as in Harvest
+    def with_response_format(self, response_format):
+        client = copy.copy(self)
+        client.__harvest = self.__harvest.with_response_format(response_format)
+        client.__owner = False
+        return client
+
+    @property
+    def harvest(self):
+        return self.__harvest
+
+    @property
+    def uri(self):
+        return self.__harvest.uri
+
+    @property
+    def headers(self):
+        return self.__harvest.headers
+
+    @property
+    def auth(self):
+        return self.__harvest.auth
+
+    # method is any of the paginated list coroutines, eg. self.time_entries
+    async def all_pages(self, method, *args, **kwargs):
+        kwargs.pop('page', None)
+        first_page = await method(*args, page=1, **kwargs)
+
+        total_pages = page_value(first_page, 'total_pages')
+
+        if total_pages is None or total_pages <= 1:
+            return [first_page]
+
+        pages = await asyncio.gather(*(method(*args, page=page, **kwargs) for page in range(2, total_pages + 1)))
+        return [first_page] + list(pages)
+
+    async def _run(self, name, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, functools.partial(getattr(self.__harvest, name), *args, **kwargs))
+
+    async def _iterate(self, name, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        items = getattr(self.__harvest, name)(*args, **kwargs)
+        exhausted = object()
+
+        while True:
+            item = await loop.run_in_executor(self.__executor, next, items, exhausted)
+            if item is exhausted:
+                return
+            yield item
+
+def _coroutine(name, method):
+    @functools.wraps(method)
+    async def coroutine(self, *args, **kwargs):
+        return await self._run(name, *args, **kwargs)
+    return coroutine
+
+def _async_generator(name, method):
+    @functools.wraps(method)
+    def async_generator(self, *args, **kwargs):
+        return self._iterate(name, *args, **kwargs)
+    return async_generator
+
+for _name, _method in vars(Harvest).items():
+    if _name.startswith('_') or not inspect.isfunction(_method) or hasattr(AsyncHarvest, _name):
+        continue
+    if _name.startswith('iter_'):
+        setattr(AsyncHarvest, _name, _async_generator(_name, _method))
+    else:
+        setattr(AsyncHarvest, _name, _coroutine(_name, _method))
+
+del _name, _method
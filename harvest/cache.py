@@ -0,0 +1,211 @@
+
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+class CacheEntry(object):
+    """A cached response body and the validators to revalidate it with.
+
+    data is the parsed body, kept by in-memory backends so a 304 doesn't
+    parse it again."""
+
+    __slots__ = ('etag', 'last_modified', 'body', 'data')
+
+    def __init__(self, etag, last_modified, body, data=None):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body = body
+        self.data = data
+
+def cache_key(url, headers):
+    """The key of url fetched with headers, the token is only hashed in."""
+    credentials = '{0}:{1}'.format(headers.get('Harvest-Account-ID'), headers.get('Authorization'))
+    return '{0} {1}'.format(hashlib.sha256(credentials.encode('utf-8')).hexdigest(), url)
+
+class MemoryCache(object):
+    """Keeps the max_entries most recently used responses in memory.
+
+    Any object with get(key), returning a CacheEntry or None, set(key,
+    entry), delete(key) and clear() can be used in its place. Safe to share
+    between threads."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.__lock:
+            self.__entries[key] = entry
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def __len__(self):
+        return len(self.__entries)
+
+class SQLiteCache(object):
+    """Keeps responses in the SQLite database at path.
+
+    The cache outlives the process, so a cron job revalidates what the last
+    run downloaded rather than fetching it again, and can be shared by
+    several processes. Parsed bodies aren't kept."""
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.__timeout = timeout
+
+        with closing(self._connect()) as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB NOT NULL)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=self.__timeout, isolation_level=None)
+
+    def get(self, key):
+        with closing(self._connect()) as connection:
+            row = connection.execute('SELECT etag, last_modified, body FROM responses WHERE key = ?', (key,)).fetchone()
+
+        if row is None:
+            return None
+
+        return CacheEntry(row[0], row[1], bytes(row[2]))
+
+    def set(self, key, entry):
+        with closing(self._connect()) as connection:
+            connection.execute('INSERT OR REPLACE INTO responses (key, etag, last_modified, body) VALUES (?, ?, ?, ?)', (key, entry.etag, entry.last_modified, entry.body))
+
+    def delete(self, key):
+        with closing(self._connect()) as connection:
+            connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+
+    def clear(self):
+        with closing(self._connect()) as connection:
+            connection.execute('DELETE FROM responses')
+
+class TTLCache(object):
+    """Keeps the max_entries most recently used values for ttl seconds each.
+
+    Counts hits, misses and evictions, expired entries count as misses.
+    Safe to share between threads."""
+
+    def __init__(self, ttl, max_entries=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__clock = clock
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.__lock:
+            item = self.__entries.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > self.__clock():
+                    self.__entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.__entries[key]
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self.__lock:
+            self.__entries[key] = (self.__clock() + self.ttl, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def __len__(self):
+        return len(self.__entries)
+
+class ReferenceCache(object):
+    """Users, projects, tasks, clients and client contacts by id.
+
+    Each kind is a TTLCache of its own with the ttl in ttls, which is
+    merged over TTLS, and at most max_entries entries. Harvest uses it for
+    get_user and friends and invalidates an entry when it is updated or
+    deleted through the same client. Changes made elsewhere show up once
+    the ttl runs out.
+
+    Cached objects are shared between callers, so shouldn't be changed.
+    Harvest hands json response format callers a copy."""
+
+    TTLS = {
+        'user': 600,
+        'project': 600,
+        'task': 3600,
+        'client': 3600,
+        'client_contact': 3600,
+    }
+
+    def __init__(self, ttls=None, max_entries=1024, clock=time.monotonic):
+        ttls = dict(self.TTLS, **(ttls or {}))
+        self.caches = {kind: TTLCache(ttl, max_entries, clock) for kind, ttl in ttls.items()}
+
+    def get(self, kind, key, default=None):
+        return self.caches[kind].get(key, default)
+
+    def set(self, kind, key, value):
+        self.caches[kind].set(key, value)
+
+    def delete(self, kind, key):
+        self.caches[kind].delete(key)
+
+    def clear(self):
+        for cache in self.caches.values():
+            cache.clear()
+
+    @property
+    def hits(self):
+        return sum(cache.hits for cache in self.caches.values())
+
+    @property
+    def misses(self):
+        return sum(cache.misses for cache in self.caches.values())
+
+    def stats(self):
+        return {kind: {'hits': cache.hits, 'misses': cache.misses, 'evictions': cache.evictions, 'entries': len(cache)} for kind, cache in self.caches.items()}
@@ -0,0 +1,47 @@
+
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class JSONCodec(object):
+    """Encodes request bodies and decodes responses with the json module.
+
+    The default codec. Any object with dumps(obj), returning str or bytes,
+    and loads(data), taking the raw response body as bytes, can be passed to
+    Harvest as codec= instead.
+    """
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+    def loads(self, data):
+        return json.loads(data)
+
+class OrjsonCodec(object):
+    """orjson, https://github.com/ijl/orjson, which needs to be installed."""
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError('OrjsonCodec needs orjson, pip install orjson')
+
+    def dumps(self, obj):
+        return orjson.dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
@@ -0,0 +1,208 @@
+
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from collections import namedtuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .harvest import HarvestError
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# The totals of a group_by group. keys are the labels of its group, one per
+# grouped by field, a subtotal has fewer and the grand total none.
+GroupTotal = namedtuple('GroupTotal', ['keys', 'hours', 'billable_amount', 'cost_amount', 'entries'])
+
+class ColumnarTimeReport(object):
+    """A DetailedTimeReport as NumPy columns, for vectorized totals and filters.
+
+    The numeric fields are float64 arrays with NaN for missing values,
+    date is a datetime64[D] array and billable a bool array. The
+    categorical fields, client, project, task and user (first and last
+    name), are int32 codes into a tuple of labels each, in order of first
+    appearance:
+
+        report = ColumnarTimeReport.from_report(reports.detailed_time())
+        report.totals()
+        report[report.where(client='123 Industries') & report.billable].total('hours')
+
+    Needs numpy, pip install numpy."""
+
+    NUMERIC_FIELDS = ('hours', 'billable_rate', 'billable_amount', 'cost_rate', 'cost_amount')
+    CATEGORICAL_FIELDS = ('client', 'project', 'task', 'user')
+    GROUP_FIELDS = ('date', 'week', 'month') + CATEGORICAL_FIELDS
+    TOTAL_FIELDS = ('hours', 'billable_amount', 'cost_amount')
+
+    def __init__(self, dates, billable, numeric, codes, categories):
+        if numpy is None:
+            raise ImportError('ColumnarTimeReport needs numpy, pip install numpy')
+
+        self.dates = dates
+        self.billable = billable
+        self.numeric = numeric
+        self.codes = codes
+        self.categories = categories
+
+    @classmethod
+    def from_report(cls, report):
+        return cls.from_entries(report.detailed_time_entries)
+
+    @classmethod
+    def from_entries(cls, entries):
+        if numpy is None:
+            raise ImportError('ColumnarTimeReport needs numpy, pip install numpy')
+
+        count = len(entries)
+        numeric = {name: numpy.empty(count, dtype=numpy.float64) for name in cls.NUMERIC_FIELDS}
+        codes = {name: numpy.empty(count, dtype=numpy.int32) for name in cls.CATEGORICAL_FIELDS}
+        lookups = {name: {} for name in cls.CATEGORICAL_FIELDS}
+        dates = []
+        billable = numpy.empty(count, dtype=bool)
+
+        for row, entry in enumerate(entries):
+            for name in cls.NUMERIC_FIELDS:
+                value = getattr(entry, name)
+                numeric[name][row] = numpy.nan if value is None else value
+
+            labels = (entry.client, entry.project, entry.task, '{0} {1}'.format(entry.first_name, entry.last_name))
+            for name, label in zip(cls.CATEGORICAL_FIELDS, labels):
+                lookup = lookups[name]
+                codes[name][row] = lookup.setdefault(label, len(lookup))
+
+            dates.append(entry.date)
+            billable[row] = str(entry.billable) == 'True'
+
+        categories = {name: tuple(lookup) for name, lookup in lookups.items()}
+        return cls(numpy.array(dates, dtype='datetime64[D]'), billable, numeric, codes, categories)
+
+    def __len__(self):
+        return len(self.dates)
+
+    # mask is a bool array or indexes, the categories are shared
+    def __getitem__(self, mask):
+        return ColumnarTimeReport(self.dates[mask], self.billable[mask], {name: column[mask] for name, column in self.numeric.items()}, {name: column[mask] for name, column in self.codes.items()}, self.categories)
+
+    def column(self, name):
+        if name == 'date':
+            return self.dates
+        if name == 'billable':
+            return self.billable
+        if name in self.numeric:
+            return self.numeric[name]
+        return self.labels(name)
+
+    # the label of every row, eg. for display
+    def labels(self, name):
+        return numpy.array(self.categories[name], dtype=object)[self.codes[name]]
+
+    # rows whose categorical fields have any of the given labels
+    def where(self, **labels):
+        mask = numpy.ones(len(self), dtype=bool)
+        for name, wanted in labels.items():
+            if isinstance(wanted, str):
+                wanted = [wanted]
+            wanted_codes = [self.categories[name].index(label) for label in wanted if label in self.categories[name]]
+            mask &= numpy.isin(self.codes[name], wanted_codes)
+        return mask
+
+    def total(self, name):
+        return float(numpy.nansum(self.numeric[name]))
+
+    def totals(self):
+        return {name: self.total(name) for name in self.NUMERIC_FIELDS}
+
+    # The sort key of every row and a function labelling a key. Categories
+    # sort by label, not by code.
+    def _group_key(self, name, week_start_day):
+        if name in self.codes:
+            categories = self.categories[name]
+            by_label = sorted(range(len(categories)), key=lambda code: str(categories[code]))
+            ranks = numpy.empty(len(categories), dtype=numpy.int64)
+            ranks[by_label] = numpy.arange(len(categories))
+            return ranks[self.codes[name]], lambda key: categories[by_label[key]]
+
+        days = self.dates.astype(numpy.int64)
+        if name == 'date':
+            return days, lambda key: str(numpy.datetime64(int(key), 'D'))
+        if name == 'week':
+            # 1970-01-01, day 0, was a Thursday
+            return days - (days + 3 - WEEKDAYS.index(week_start_day)) % 7, lambda key: str(numpy.datetime64(int(key), 'D'))
+        if name == 'month':
+            return self.dates.astype('datetime64[M]').astype(numpy.int64), lambda key: str(numpy.datetime64(int(key), 'M'))
+
+        raise HarvestError('Invalid group "{0}".'.format(name))
+
+    def group_by(self, *names, week_start_day='Monday'):
+        """Totals hours, billable and cost amounts by names, any of GROUP_FIELDS.
+
+        Returns GroupTotals in order, each group followed by the subtotals
+        of the groups it closes, ending with the grand total, as a pivot
+        table lays them out. week groups are labelled with the date they
+        start on, months as YYYY-MM.
+
+        The rows are sorted once by all the keys, each level's groups
+        start where one of its keys changes and numpy.add.reduceat totals
+        them, Python only loops over the groups."""
+        keys, labellers = [], []
+        for name in names:
+            key, labeller = self._group_key(name, week_start_day)
+            keys.append(key)
+            labellers.append(labeller)
+        count = len(self)
+
+        if count == 0:
+            return [GroupTotal((), 0.0, 0.0, 0.0, 0)]
+
+        order = numpy.lexsort(keys[::-1]) if keys else numpy.arange(count)
+        keys = [key[order] for key in keys]
+        values = [numpy.nan_to_num(self.numeric[name][order]) for name in self.TOTAL_FIELDS]
+
+        # starts[level] indexes the first row of each group of the first
+        # level keys, level 0 being the grand total
+        changed = numpy.zeros(count, dtype=bool)
+        changed[0] = True
+        starts = [numpy.flatnonzero(changed)]
+        for key in keys:
+            changed[1:] |= key[1:] != key[:-1]
+            starts.append(numpy.flatnonzero(changed))
+
+        levels = []
+        for level_starts in starts:
+            totals = [numpy.add.reduceat(value, level_starts).tolist() for value in values]
+            entries = numpy.diff(numpy.append(level_starts, count)).tolist()
+            levels.append((level_starts.tolist(), totals, entries))
+
+        def group_total(level, group):
+            level_starts, totals, entries = levels[level]
+            row = level_starts[group]
+            labels = tuple(labeller(key[row]) for labeller, key in zip(labellers, keys[:level]))
+            return GroupTotal(labels, *(total[group] for total in totals), entries[group])
+
+        deepest = len(keys)
+        group_ends = [level_starts[1:] + [count] for level_starts, totals, entries in levels]
+        next_group = [0] * (deepest + 1)
+
+        results = []
+        for group, end in enumerate(group_ends[deepest]):
+            results.append(group_total(deepest, group))
+            for level in range(deepest - 1, -1, -1):
+                if group_ends[level][next_group[level]] != end:
+                    break
+                results.append(group_total(level, next_group[level]))
+                next_group[level] += 1
+
+        return results
@@ -0,0 +1,214 @@
+
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Specialised from_dict.
+
+dacite.from_dict resolves type hints and walks Optional and List for every
+object it builds. Here each dataclass gets a decoder generated once, on first
+use, which only does the work its fields need: scalars are copied, nested
+dataclasses and lists of them call the nested decoder directly.
+
+Results are the same as dacite.from_dict (missing Optional fields are None,
+missing fields with defaults take the default, init=False fields are set
+after __init__, a missing required field raises MissingValueError) except
+that the types of values aren't checked.
+
+With lazy=True instances are of a subclass, made by lazy_class, whose nested
+fields are kept as the raw JSON and only decoded, then cached on the
+instance, the first time they're read. Reading only hours and spent_date of
+a TimeEntry never builds its user, client, project and so on.
+"""
+
+from collections.abc import Mapping
+from dataclasses import fields, is_dataclass, MISSING
+import threading
+import typing
+
+from dacite import MissingValueError
+
+_decoders = {}
+_decoders_lock = threading.RLock()
+
+def from_dict(data_class, data, lazy=False):
+    return decoder(data_class, lazy)(data)
+
+def decoder(data_class, lazy=False):
+    key = (data_class, lazy)
+
+    try:
+        return _decoders[key]
+    except KeyError:
+        pass
+
+    with _decoders_lock:
+        if key not in _decoders:
+            # stand in while building so self referencing classes resolve
+            _decoders[key] = lambda data: _decoders[key](data)
+            try:
+                _decoders[key] = _compile(data_class, lazy)
+            except BaseException:
+                del _decoders[key]
+                raise
+
+        return _decoders[key]
+
+class _LazyField(object):
+    """Decodes the raw value of a field the first time it's read.
+
+    Only consulted while the field isn't in the instance __dict__ as it
+    doesn't define __set__, so once decoded reads are plain attribute reads."""
+
+    def __init__(self, name, convert):
+        self.name = name
+        self.convert = convert
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        instance_dict = instance.__dict__
+        raw = instance_dict.get('_lazy_fields')
+
+        if raw is not None and self.name in raw:
+            value = self.convert(raw[self.name])
+            instance_dict[self.name] = value
+            raw.pop(self.name, None)
+            return value
+
+        try:
+            return instance_dict[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+_lazy_classes = {}
+
+def lazy_class(data_class):
+    with _decoders_lock:
+        if data_class not in _lazy_classes:
+            namespace = {'Mapping': Mapping}
+            hints = _type_hints(data_class)
+            class_dict = {'__module__': data_class.__module__, '__qualname__': data_class.__qualname__}
+
+            for data_field in fields(data_class):
+                converted = _convert(hints.get(data_field.name, data_field.type), '_value', namespace, True)
+                if converted != '_value':
+                    class_dict[data_field.name] = _LazyField(data_field.name, eval('lambda _value: ' + converted, namespace))
+
+            lazy = type(data_class)(data_class.__name__, (data_class,), class_dict)
+            _lazy_classes[data_class] = lazy
+            _lazy_classes[lazy] = lazy
+
+        return _lazy_classes[data_class]
+
+def _is_optional(type_):
+    return getattr(type_, '__origin__', None) is typing.Union and type(None) in type_.__args__
+
+def _unwrap_optional(type_):
+    if _is_optional(type_):
+        args = [arg for arg in type_.__args__ if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return type_
+
+def _is_list(type_):
+    return getattr(type_, '__origin__', None) in (list, typing.List)
+
+def _type_hints(data_class):
+    try:
+        return typing.get_type_hints(data_class)
+    except (NameError, TypeError):
+        return {data_field.name: data_field.type for data_field in fields(data_class)}
+
+# Source for an expression converting the raw value named value to type_.
+# Anything which isn't a dataclass or a list is used as it is.
+def _convert(type_, value, namespace, lazy=False):
+    type_ = _unwrap_optional(type_)
+
+    if isinstance(type_, type) and is_dataclass(type_):
+        name = '_decode_{0}'.format(len(namespace))
+        namespace[name] = decoder(type_, lazy)
+        return '({1}({0}) if isinstance({0}, Mapping) else {0})'.format(value, name)
+
+    if _is_list(type_):
+        item_type = type_.__args__[0] if getattr(type_, '__args__', None) else typing.Any
+        item = _convert(item_type, '_item', namespace, lazy)
+        return '(None if {0} is None else [{1} for _item in {0}])'.format(value, item)
+
+    return value
+
+def _compile(data_class, lazy=False):
+    hints = _type_hints(data_class)
+    target_class = lazy_class(data_class) if lazy else data_class
+    namespace = {'_data_class': target_class, 'Mapping': Mapping, 'MissingValueError': MissingValueError, 'MISSING': MISSING}
+    init_lines = []
+    init_names = []
+    lazy_names = []
+    post_init_lines = []
+
+    for index, data_field in enumerate(fields(data_class)):
+        name = data_field.name
+        type_ = hints.get(name, data_field.type)
+        converted = _convert(type_, '_value', namespace, lazy)
+        is_lazy = lazy and converted != '_value'
+
+        # lazy fields are passed to __init__ raw, then moved aside for _LazyField
+        if is_lazy:
+            converted = '_value'
+
+        if data_field.default is not MISSING:
+            default = '_default_{0}'.format(index)
+            namespace[default] = data_field.default
+        elif data_field.default_factory is not MISSING:
+            default = '_default_{0}()'.format(index)
+            namespace['_default_{0}'.format(index)] = data_field.default_factory
+        elif _is_optional(type_):
+            default = 'None'
+        else:
+            default = None
+
+        if data_field.init:
+            init_names.append(name)
+            if is_lazy:
+                lazy_names.append(name)
+            if default is None:
+                # a missing key raises KeyError, turned into MissingValueError below
+                init_lines.append('_value = data[{0!r}]'.format(name))
+                init_lines.append('{0} = {1}'.format(name, converted))
+            else:
+                init_lines.append('_value = data.get({0!r}, MISSING)'.format(name))
+                init_lines.append('{0} = {1} if _value is MISSING else {2}'.format(name, default, converted))
+        else:
+            # init=False fields are set after __init__, if given or defaulted
+            target = "_lazy_fields[{0!r}]".format(name) if is_lazy else '_instance.{0}'.format(name)
+            post_init_lines.append('_value = data.get({0!r}, MISSING)'.format(name))
+            post_init_lines.append('if _value is not MISSING:')
+            post_init_lines.append('    {0} = {1}'.format(target, converted))
+            if default is not None:
+                post_init_lines.append('else:')
+                post_init_lines.append('    {0} = {1}'.format(target, default))
+
+    source = ['def decode(data):', '    try:']
+    source.extend('        ' + line for line in init_lines or ['pass'])
+    source.append('    except KeyError as error:')
+    source.append('        raise MissingValueError(error.args[0]) from None')
+    source.append('    _instance = _data_class({0})'.format(', '.join('{0}={0}'.format(name) for name in init_names)))
+    if lazy:
+        source.append('    _instance_dict = _instance.__dict__')
+        source.append('    _lazy_fields = _instance_dict["_lazy_fields"] = {{{0}}}'.format(', '.join('{0!r}: _instance_dict.pop({0!r})'.format(name) for name in lazy_names)))
+    source.extend('    ' + line for line in post_init_lines)
+    source.append('    return _instance')
+
+    exec(compile('\n'.join(source), '<decoder {0}>'.format(data_class.__qualname__), 'exec'), namespace)
+    return namespace['decode']
@@ -0,0 +1,197 @@
+
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Streams list endpoints to CSV or JSON Lines.
+
+Pages are fetched with the json response format, following links.next, and
+each page is written at once before the next is read, so only a
+page of rows is ever held in memory. resource is the name of any list method,
+eg. 'time_entries', 'expenses' or 'invoices', or 'detailed_time' for a
+harvest.reports.Reports client. Remaining arguments go to that method.
+
+    with open('time_entries.csv', 'w', newline='') as fh:
+        export_csv(client, 'time_entries', fh, from_date='2020-01-01')
+
+buffer_size fetches up to that many pages ahead on a background thread while
+the previous ones are written.
+"""
+
+import csv
+import itertools
+import json
+import typing
+from dataclasses import fields, is_dataclass
+
+from . import harvestdataclasses
+from .harvest import HarvestError, page_items
+from .harvestdataclasses import BasePage, DetailedTimeEntry
+from .reports import prefetch
+
+# detailed_time rows are written this many at a time, as a page would be
+DETAILED_TIME_BATCH = 100
+
+# Writes resource to fh as CSV and returns the number of rows written.
+# Nested objects become dotted columns, eg. client.id and client.name, lists
+# are written as JSON and invoices get a row per line item. columns defaults
+# to those of the resource's dataclass, so a nested object missing from the
+# first page still gets its columns, then any others on the first page.
+def export_csv(client, resource, fh, *args, columns=None, buffer_size=None, **kwargs):
+    writer = csv.writer(fh)
+    count = 0
+
+    if columns is not None:
+        writer.writerow(columns)
+
+    for data_class, rows in _pages_of_rows(client, resource, args, kwargs, buffer_size, flatten=True):
+        if columns is None:
+            columns = _columns(data_class, rows, line_items=resource == 'invoices')
+            writer.writerow(columns)
+        writer.writerows([[row.get(column) for column in columns] for row in rows])
+        count += len(rows)
+
+    return count
+
+# Writes resource to fh as JSON Lines, an object a line as Harvest returns
+# it, with the client's codec. Returns the number of rows written.
+def export_jsonl(client, resource, fh, *args, buffer_size=None, **kwargs):
+    dumps = client.codec.dumps
+    count = 0
+
+    for data_class, rows in _pages_of_rows(client, resource, args, kwargs, buffer_size, flatten=False):
+        lines = [dumps(row) for row in rows]
+        lines = [line.decode('utf-8') if isinstance(line, bytes) else line for line in lines]
+        lines.append('')
+        fh.write('\n'.join(lines))
+        count += len(rows)
+
+    return count
+
+# Yields the dataclass of the items, None when it isn't known, and a list
+# of row dicts per page. There's always at least one, maybe empty, page.
+def _pages_of_rows(client, resource, args, kwargs, buffer_size, flatten):
+    if resource == 'detailed_time':
+        if not hasattr(client, 'iter_detailed_time'):
+            raise HarvestError('detailed_time needs a harvest.reports.Reports client.')
+
+        names = [detailed_time_field.name for detailed_time_field in fields(DetailedTimeEntry)]
+        entries = client.iter_detailed_time(*args, buffer_size=buffer_size, **kwargs)
+        for batch_number in itertools.count():
+            batch = list(itertools.islice(entries, DETAILED_TIME_BATCH))
+            if not batch and batch_number > 0:
+                return
+            yield DetailedTimeEntry, [{name: _value(getattr(entry, name)) if flatten else getattr(entry, name) for name in names} for entry in batch]
+
+    if not hasattr(client, 'iter_{0}'.format(resource)):
+        raise HarvestError('Unknown resource "{0}".'.format(resource))
+
+    json_client = client.with_response_format('json')
+    pages = json_client._iter_pages(getattr(json_client, resource), *args, **kwargs)
+    if buffer_size:
+        pages = prefetch(pages, buffer_size)
+
+    for page in pages:
+        items = page_items(page)
+        data_class = _item_classes().get(next((key for key, value in page.items() if value is items), None))
+        if not flatten:
+            yield data_class, items
+        elif resource == 'invoices':
+            yield data_class, [row for item in items for row in _invoice_rows(item)]
+        else:
+            yield data_class, [_flatten(item) for item in items]
+
+# A row per line item, with the invoice's columns repeated
+def _invoice_rows(invoice):
+    line_items = invoice.get('line_items') or [{}]
+    invoice = _flatten({key: value for key, value in invoice.items() if key != 'line_items'})
+
+    for line_item in line_items:
+        row = dict(invoice)
+        _flatten(line_item, 'line_items.', row)
+        yield row
+
+def _flatten(item, prefix='', row=None):
+    if row is None:
+        row = {}
+
+    for key, value in item.items():
+        if isinstance(value, dict):
+            _flatten(value, '{0}{1}.'.format(prefix, key), row)
+        else:
+            row[prefix + key] = _value(value)
+    return row
+
+def _value(value):
+    if isinstance(value, (list, tuple)):
+        return json.dumps(value)
+    return value
+
+# The columns of data_class, or with line_items those of an invoice with
+# its line items flattened, followed by any others of rows in the order
+# first seen. Objects which are None in rows aren't columns of their own.
+def _columns(data_class, rows, line_items=False):
+    columns = {}
+    if data_class is not None:
+        for column in _schema_columns(data_class):
+            if line_items and column == 'line_items':
+                for line_item_column in _schema_columns(harvestdataclasses.LineItem, 'line_items.'):
+                    columns.setdefault(line_item_column, None)
+            else:
+                columns.setdefault(column, None)
+
+    nested = {column.rsplit('.', 1)[0] for column in columns if '.' in column}
+    for row in rows:
+        for column in row:
+            if column not in nested:
+                columns.setdefault(column, None)
+    return list(columns)
+
+# The dotted columns of a dataclass, nested dataclasses expanded and lists
+# as one column. seen stops recursive types.
+def _schema_columns(data_class, prefix='', seen=()):
+    columns = []
+    hints = typing.get_type_hints(data_class)
+
+    for data_class_field in fields(data_class):
+        if not data_class_field.init:
+            continue
+
+        field_type = hints[data_class_field.name]
+        if typing.get_origin(field_type) is typing.Union:
+            field_type = next(arg for arg in typing.get_args(field_type) if arg is not type(None))
+
+        name = prefix + data_class_field.name
+        if is_dataclass(field_type) and field_type not in seen:
+            columns.extend(_schema_columns(field_type, name + '.', seen + (data_class,)))
+        else:
+            columns.append(name)
+    return columns
+
+_item_classes_by_key = None
+
+# The item dataclass of each page's list, by its key, eg. time_entries: TimeEntry
+def _item_classes():
+    global _item_classes_by_key
+
+    if _item_classes_by_key is None:
+        item_classes = {}
+        for page_class in vars(harvestdataclasses).values():
+            if not (isinstance(page_class, type) and is_dataclass(page_class) and issubclass(page_class, BasePage)):
+                continue
+            hints = typing.get_type_hints(page_class)
+            for page_field in fields(page_class):
+                if not page_field.init and typing.get_origin(hints[page_field.name]) is list:
+                    item_classes.setdefault(page_field.name, typing.get_args(hints[page_field.name])[0])
+        _item_classes_by_key = item_classes
+
+    return _item_classes_by_key
@@ -14,17 +14,25 @@
 # limitations under the License.
 
 import json
-from dataclasses import asdict
-from collections import deque
-from datetime import timedelta, datetime
-import time
+from dataclasses import asdict, fields
+from datetime import datetime
 import copy
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.request import ACCEPT_ENCODING
 from requests_oauthlib import OAuth2Session
-from dacite import from_dict
+from .cache import CacheEntry, cache_key
+from .codecs import JSONCodec
+from .decoders import from_dict
+from .slotteddataclasses import slotted
+from .transfer import TransferStats
 
 from .harvestdataclasses import *
+from .ratelimit import shared_rate_limiter
+from .retry import RetryPolicy, retry_after_seconds
 
 try:
     from urllib.parse import urlparse
@@ -36,13 +44,29 @@ class HarvestError(Exception):
 
 class Harvest(object):
 
-    # 15 is from the Harvest API doco https://help.getharvest.com/api-v2/introduction/overview/general/
+    # 100 and 15 are from the Harvest API doco https://help.getharvest.com/api-v2/introduction/overview/general/
+    RATE_LIMIT_REQUESTS = 100
     RATE_LIMIT_DURATION_SECONDS = 15
 
-    def __init__(self, uri, auth):
+    # requests' own defaults, per https://requests.readthedocs.io/en/latest/api/#requests.adapters.HTTPAdapter
+    POOL_CONNECTIONS = 10
+    POOL_MAXSIZE = 10
+
+    # dataclass: the dataclasses in harvestdataclasses
+    # slotted: their __slots__ versions in slotteddataclasses, for large result sets
+    # lazy: the dataclasses, with nested objects only decoded when first read
+    # json: the parsed JSON, skipping the dataclasses altogether
+    # bytes: as json, but list and get methods return the undecoded response body
+    RESPONSE_FORMATS = ('dataclass', 'slotted', 'lazy', 'json', 'bytes')
+
+    def __init__(self, uri, auth, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, pool_block=False, keep_alive=True, rate_limiter=None, retry_policy=None, response_format='dataclass', codec=None, cache=None, accept_encoding=ACCEPT_ENCODING, reference_cache=None):
         self.__uri = uri.rstrip('/')
         parsed = urlparse(uri)
 
+        if response_format not in self.RESPONSE_FORMATS:
+            raise HarvestError('Invalid response format "{0}".'.format(response_format))
+        self.response_format = response_format
+
         self.__headers = {'User-Agent': 'Lionheart/python-harvest',
             'Accept': 'application/json',
             'Content-Type': 'application/json'
@@ -65,8 +89,60 @@ class Harvest(object):
             raise HarvestError('Invalid authorization type "{0}".'.format(type(auth)))
 
         self.__auth = auth
-        self.request_throttle = deque()
-        self.time_limit = timedelta(seconds=self.RATE_LIMIT_DURATION_SECONDS)
+
+        # Harvest limits requests per token so, unless told otherwise, every
+        # client in this process using the same token shares one limiter.
+        if rate_limiter is None:
+            rate_limiter = shared_rate_limiter((self.__headers.get('Harvest-Account-ID'), self.__headers['Authorization']), self.RATE_LIMIT_REQUESTS, self.RATE_LIMIT_DURATION_SECONDS)
+        self.__rate_limiter = rate_limiter
+
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        self.__retry_policy = retry_policy
+
+        if codec is None:
+            codec = JSONCodec()
+        self.__codec = codec
+
+        # eg. harvest.cache.MemoryCache(), GET responses carrying an ETag or
+        # Last-Modified are revalidated rather than downloaded again
+        self.__cache = cache
+
+        # eg. harvest.cache.ReferenceCache(), serves get_user, get_project,
+        # get_task, get_client and get_client_contact
+        self.__reference_cache = reference_cache
+
+        # One long lived session so connections to the API host are reused
+        # rather than paying a TCP and TLS handshake on every call.
+        # pool_connections is the number of hosts to keep pools for,
+        # pool_maxsize the number of connections kept per host and
+        # pool_block makes callers wait for a free connection rather than
+        # opening (and then discarding) one beyond pool_maxsize.
+        self.__pool_maxsize = pool_maxsize
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.__session.mount('https://', adapter)
+        self.__session.mount('http://', adapter)
+
+        if not keep_alive:
+            self.__session.headers['Connection'] = 'close'
+
+        # by default every encoding urllib3 can decode here, gzip and deflate
+        # plus br and zstd when brotli and zstandard are installed. 'identity'
+        # turns compression off.
+        self.__session.headers['Accept-Encoding'] = accept_encoding
+        self.__transfer_stats = TransferStats()
+
+        self._build_request_template()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.__session.close()
 
     @property
     def uri(self):
@@ -80,6 +156,69 @@ class Harvest(object):
     def auth(self):
         return self.__auth
 
+    @property
+    def session(self):
+        return self.__session
+
+    @property
+    def rate_limiter(self):
+        return self.__rate_limiter
+
+    @property
+    def retry_policy(self):
+        return self.__retry_policy
+
+    @property
+    def codec(self):
+        return self.__codec
+
+    @property
+    def cache(self):
+        return self.__cache
+
+    @property
+    def transfer_stats(self):
+        return self.__transfer_stats
+
+    @property
+    def reference_cache(self):
+        return self.__reference_cache
+
+    @property
+    def pool_maxsize(self):
+        return self.__pool_maxsize
+
+    # A client sharing this one's connections, rate limiter and so on, which
+    # returns responses in another format. eg. client.with_response_format('json').time_entries()
+    def with_response_format(self, response_format):
+        if response_format not in self.RESPONSE_FORMATS:
+            raise HarvestError('Invalid response format "{0}".'.format(response_format))
+
+        client = copy.copy(self)
+        client.response_format = response_format
+        return client
+
+    # method is any of the paginated list methods, eg. self.time_entries
+    # Page 1 gives total_pages, after which the remaining pages are fetched
+    # concurrently. Pages are returned in page order.
+    # first_page is page 1 of the same query when it was already fetched
+    def all_pages(self, method, *args, max_workers=None, first_page=None, **kwargs):
+        kwargs.pop('page', None)
+        if first_page is None:
+            first_page = method(*args, page=1, **kwargs)
+
+        total_pages = page_value(first_page, 'total_pages')
+
+        if total_pages is None or total_pages <= 1:
+            return [first_page]
+
+        if max_workers is None:
+            max_workers = self.__pool_maxsize
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pages = executor.map(lambda page: method(*args, page=page, **kwargs), range(2, total_pages + 1))
+            return [first_page] + list(pages)
+
     ## Client Contacts
 
     def client_contacts(self, page=1, per_page=100, client_id=None, updated_since=None):
@@ -90,22 +229,28 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=ClientContacts, data=self._get(url))
+        return self._from_dict(data_class=ClientContacts, data=self._get(url))
+
+    def iter_client_contacts(self, **kwargs):
+        return self._iter_items(self.client_contacts, **kwargs)
 
     def get_client_contact(self, contact_id):
-        return from_dict(data_class=ClientContact, data=self._get('/contacts/{0}'.format(contact_id)))
+        return self._get_reference('client_contact', contact_id, ClientContact, '/contacts/{0}'.format(contact_id))
 
     def create_client_contact(self, client_id, first_name, **kwargs):
         url  = '/contacts'
         kwargs.update({'client_id': client_id, 'first_name': first_name})
-        return from_dict(data_class=ClientContact, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=ClientContact, data=self._post(url, data=kwargs))
 
     def update_client_contact(self, contact_id, **kwargs):
         url = '/contacts/{0}'.format(contact_id)
-        return from_dict(data_class=ClientContact, data=self._patch(url, data=kwargs))
+        response = self._patch(url, data=kwargs)
+        self._invalidate_reference('client_contact', contact_id)
+        return self._from_dict(data_class=ClientContact, data=response)
 
     def delete_client_contact(self, contact_id):
         self._delete('/contacts/{0}'.format(contact_id))
+        self._invalidate_reference('client_contact', contact_id)
 
     ## Clients
 
@@ -117,10 +262,13 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=Clients, data=self._get(url))
+        return self._from_dict(data_class=Clients, data=self._get(url))
+
+    def iter_clients(self, **kwargs):
+        return self._iter_items(self.clients, **kwargs)
 
     def get_client(self, client_id):
-        return from_dict(data_class=Client, data=self._get('/clients/{0}'.format(client_id)))
+        return self._get_reference('client', client_id, Client, '/clients/{0}'.format(client_id))
 
     def create_client(self, name, **kwargs):
         url  = '/clients'
@@ -128,22 +276,25 @@ class Harvest(object):
         response = self._post(url, data=kwargs)
 
         if 'message' in response.keys():
-            return from_dict(data_class=ErrorMessage, data=response)
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=Client, data=response)
+        return self._from_dict(data_class=Client, data=response)
 
     def update_client(self, client_id, **kwargs):
         url = '/clients/{0}'.format(client_id)
-        return from_dict(data_class=Client, data=self._patch(url, data=kwargs))
+        response = self._patch(url, data=kwargs)
+        self._invalidate_reference('client', client_id)
+        return self._from_dict(data_class=Client, data=response)
 
     def delete_client(self, client_id):
         self._delete('/clients/{0}'.format(client_id))
+        self._invalidate_reference('client', client_id)
 
     ## Company
 
     def company(self, page=1, per_page=100, is_active=None, updated_since_datetime=None):
         url = '/company'
-        return from_dict(data_class=Company, data=self._get(url))
+        return self._from_dict(data_class=Company, data=self._get(url))
 
     ## Invoices
 
@@ -155,7 +306,10 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=InvoiceMessages, data=self._get(url))
+        return self._from_dict(data_class=InvoiceMessages, data=self._get(url))
+
+    def iter_invoice_messages(self, invoice_id, **kwargs):
+        return self._iter_items(self.invoice_messages, invoice_id, **kwargs)
 
     def create_invoice_message(self, invoice_id, recipients, **kwargs):
         url  = '/invoices/{0}/messages'.format(invoice_id)
@@ -163,13 +317,13 @@ class Harvest(object):
         response = self._post(url, data=kwargs)
 
         if 'message' in response.keys():
-            return from_dict(data_class=ErrorMessage, data=response)
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=InvoiceMessage, data=response)
+        return self._from_dict(data_class=InvoiceMessage, data=response)
 
     def mark_draft_invoice(self, invoice_id, event_type):
         url = '/invoices/{0}/messages'.format(invoice_id)
-        return from_dict(data_class=InvoiceMessage, data=self._post(url, data={'event_type': event_type}))
+        return self._from_dict(data_class=InvoiceMessage, data=self._post(url, data={'event_type': event_type}))
 
     def mark_draft_invoice_as_sent(self, invoice_id):
         return self.mark_draft_invoice(invoice_id, 'send')
@@ -195,7 +349,10 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=InvoicePayments, data=self._get(url))
+        return self._from_dict(data_class=InvoicePayments, data=self._get(url))
+
+    def iter_invoice_payments(self, invoice_id, **kwargs):
+        return self._iter_items(self.invoice_payments, invoice_id, **kwargs)
 
     def create_invoice_payment(self, invoice_id, amount, **kwargs):
         url  = '/invoices/{0}/payments'.format(invoice_id)
@@ -203,9 +360,9 @@ class Harvest(object):
         response = self._post(url, data=kwargs)
 
         if 'message' in response.keys():
-            return from_dict(data_class=ErrorMessage, data=response)
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=InvoicePayment, data=response)
+        return self._from_dict(data_class=InvoicePayment, data=response)
 
     def delete_invoice_payment(self, invoice_id, payment_id):
         self._delete('/invoices/{0}/payments/{1}'.format(invoice_id, payment_id))
@@ -228,15 +385,18 @@ class Harvest(object):
         if state is not None:
             url = '{0}&state={1}'.format(url, state)
 
-        return from_dict(data_class=Invoices, data=self._get(url))
+        return self._from_dict(data_class=Invoices, data=self._get(url))
+
+    def iter_invoices(self, **kwargs):
+        return self._iter_items(self.invoices, **kwargs)
 
     def get_invoice(self, invoice_id):
-        return from_dict(data_class=Invoice, data=self._get('/invoices/{0}'.format(invoice_id)))
+        return self._from_dict(data_class=Invoice, data=self._get('/invoices/{0}'.format(invoice_id)))
 
     def create_invoice(self, client_id, **kwargs):
         url = '/invoices'
         kwargs.update({'client_id': client_id})
-        return from_dict(data_class=Invoice, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=Invoice, data=self._post(url, data=kwargs))
 
     # invoice is a dataclass invoice
     def create_free_form_invoice(self, client_id, free_form_invoice):
@@ -251,9 +411,9 @@ class Harvest(object):
         response = self._patch(url, data=kwargs)
 
         if 'message' in response.keys():
-            return from_dict(data_class=ErrorMessage, data=response)
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=Invoice, data=response)
+        return self._from_dict(data_class=Invoice, data=response)
 
     def create_invoice_line_item(self, invoice_id, line_items):
         if not isinstance(line_items, list):
@@ -274,7 +434,7 @@ class Harvest(object):
         for item in line_items:
             delete_line_item.append({'id':item['id'], '_destroy':True})
 
-        return from_dict(data_class=Invoice, data=self._patch(url, data={'line_items': delete_line_item}))
+        return self._from_dict(data_class=Invoice, data=self._patch(url, data={'line_items': delete_line_item}))
 
     def delete_invoice(self, invoice_id):
         self._delete('/invoices/{0}'.format(invoice_id))
@@ -286,19 +446,22 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=InvoiceItemCategories, data=self._get(url))
+        return self._from_dict(data_class=InvoiceItemCategories, data=self._get(url))
+
+    def iter_invoice_item_categories(self, **kwargs):
+        return self._iter_items(self.invoice_item_categories, **kwargs)
 
     def get_invoice_item_category(self, category_id):
         url = '/invoice_item_categories/{0}'.format(category_id)
-        return from_dict(data_class=InvoiceItemCategory, data=self._get(url))
+        return self._from_dict(data_class=InvoiceItemCategory, data=self._get(url))
 
     def create_invoice_item_category(self, name):
         url = '/invoice_item_categories'
-        return from_dict(data_class=InvoiceItemCategory, data=self._post(url, data={'name': name}))
+        return self._from_dict(data_class=InvoiceItemCategory, data=self._post(url, data={'name': name}))
 
     def update_invoice_item_category(self, category_id, name):
         url = '/invoice_item_categories/{0}'.format(category_id)
-        return from_dict(data_class=InvoiceItemCategory, data=self._patch(url, data={'name': name}))
+        return self._from_dict(data_class=InvoiceItemCategory, data=self._patch(url, data={'name': name}))
 
     def delete_invoice_item_category(self, invoice_category_id):
         self._delete('/invoice_item_categories/{0}'.format(invoice_category_id))
@@ -313,7 +476,10 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=EstimateMessages, data=self._get(url))
+        return self._from_dict(data_class=EstimateMessages, data=self._get(url))
+
+    def iter_estimate_messages(self, estimate_id, **kwargs):
+        return self._iter_items(self.estimate_messages, estimate_id, **kwargs)
 
     # recipients is a list of Recipient
     def create_estimate_message(self, estimate_id, recipients, **kwargs):
@@ -322,16 +488,16 @@ class Harvest(object):
         response = self._post(url, data=kwargs)
 
         if 'message' in response.keys():
-            return from_dict(data_class=ErrorMessage, data=response)
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=EstimateMessage, data=response)
+        return self._from_dict(data_class=EstimateMessage, data=response)
 
     def delete_estimate_message(self, estimate_id, message_id):
         self._delete('/estimates/{0}/messages/{1}'.format(estimate_id, message_id))
 
     def mark_draft_estimate(self, estimate_id, event_type):
         url  = '/estimates/{0}/messages'.format(estimate_id)
-        return from_dict(data_class=EstimateMessage, data=self._post(url, data={'event_type': event_type}))
+        return self._from_dict(data_class=EstimateMessage, data=self._post(url, data={'event_type': event_type}))
 
     def mark_draft_estimate_as_sent(self, estimate_id):
         return self.mark_draft_estimate(estimate_id, 'send')
@@ -358,21 +524,24 @@ class Harvest(object):
         if to_date is not None:
             url = '{0}&to_date={1}'.format(url, to_date)
 
-        return from_dict(data_class=Estimates, data=self._get(url))
+        return self._from_dict(data_class=Estimates, data=self._get(url))
+
+    def iter_estimates(self, **kwargs):
+        return self._iter_items(self.estimates, **kwargs)
 
     def get_estimte(self, estimate_id):
         url = '/estimates/{0}'.format(estimate_id)
-        return from_dict(data_class=Estimate, data=self._get(url))
+        return self._from_dict(data_class=Estimate, data=self._get(url))
 
     def create_estimate(self, client_id, **kwargs):
         url  = '/estimates'
         kwargs.update({'client_id': client_id})
 
-        return from_dict(data_class=Estimate, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=Estimate, data=self._post(url, data=kwargs))
 
     def update_estimate(self, estimate_id, **kwargs):
         url = '/estimates/{0}'.format(estimate_id)
-        return from_dict(data_class=Estimate, data=self._patch(url, data=kwargs))
+        return self._from_dict(data_class=Estimate, data=self._patch(url, data=kwargs))
 
     def create_estimate_line_item(self, estimate_id, line_items):
         if not isinstance(line_items, list):
@@ -392,7 +561,7 @@ class Harvest(object):
         for item in line_items:
             delete_line_item.append({'id':item.id, '_destroy':True})
 
-        return from_dict(data_class=Estimate, data=self._patch(url, data={'line_items': delete_line_item}))
+        return self._from_dict(data_class=Estimate, data=self._patch(url, data={'line_items': delete_line_item}))
 
     def delete_estimate(self, estimate_id):
         self._delete('/estimates/{0}'.format(estimate_id))
@@ -404,19 +573,22 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=EstimateItemCategories, data=self._get(url))
+        return self._from_dict(data_class=EstimateItemCategories, data=self._get(url))
+
+    def iter_estimate_item_categories(self, **kwargs):
+        return self._iter_items(self.estimate_item_categories, **kwargs)
 
     def get_estimate_item_category(self, estimate_item_category_id):
         url = '/estimate_item_categories/{0}'.format(estimate_item_category_id)
-        return from_dict(data_class=EstimateItemCategory, data=self._get(url))
+        return self._from_dict(data_class=EstimateItemCategory, data=self._get(url))
 
     def create_estimate_item_category(self, name):
         url = '/estimate_item_categories'
-        return from_dict(data_class=EstimateItemCategory, data=self._post(url, data={'name': name}))
+        return self._from_dict(data_class=EstimateItemCategory, data=self._post(url, data={'name': name}))
 
     def update_estimate_item_category(self, estimate_item_category_id, name):
         url = '/estimate_item_categories/{0}'.format(estimate_item_category_id)
-        return from_dict(data_class=EstimateItemCategory, data=self._patch(url, data={'name': name}))
+        return self._from_dict(data_class=EstimateItemCategory, data=self._patch(url, data={'name': name}))
 
     def delete_estimate_item_category(self, estimate_item_id):
         self._delete('/estimate_item_categories/{0}'.format(estimate_item_id))
@@ -440,12 +612,15 @@ class Harvest(object):
         if from_date is not None:
             url = '{0}&from={1}'.format(url, from_date)
         if to_date is not None:
-            url = '{0}&to_date={1}'.format(url, to_date)
+            url = '{0}&to={1}'.format(url, to_date)
 
-        return from_dict(data_class=Expenses, data=self._get(url))
+        return self._from_dict(data_class=Expenses, data=self._get(url))
+
+    def iter_expenses(self, **kwargs):
+        return self._iter_items(self.expenses, **kwargs)
 
     def get_expense(self, expense_id):
-        return from_dict(data_class=Expense, data=self._get('/expenses/{0}'.format(expense_id)))
+        return self._from_dict(data_class=Expense, data=self._get('/expenses/{0}'.format(expense_id)))
 
     def create_expense(self, project_id, expense_category_id, spent_date, **kwargs):
         url = '/expenses'
@@ -458,9 +633,9 @@ class Harvest(object):
             response = self._post(url, data=kwargs)
 
             if 'message' in response.keys():
-                return from_dict(data_class=ErrorMessage, data=response)
+                return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=Expense, data=response)
+        return self._from_dict(data_class=Expense, data=response)
 
     def update_expense(self, expense_id, **kwargs):
         url = '/expenses/{0}'.format(expense_id)
@@ -471,7 +646,7 @@ class Harvest(object):
         else:
             response = self._patch(url, data=kwargs)
 
-        return from_dict(data_class=Expense, data=response)
+        return self._from_dict(data_class=Expense, data=response)
 
     def delete_expense(self, expense_id):
         self._delete('/expenses/{0}'.format(expense_id))
@@ -485,19 +660,22 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=ExpenseCategories, data=self._get(url))
+        return self._from_dict(data_class=ExpenseCategories, data=self._get(url))
+
+    def iter_expense_categories(self, **kwargs):
+        return self._iter_items(self.expense_categories, **kwargs)
 
     def get_expense_category(self, expense_category_id):
-        return from_dict(data_class=ExpenseCategory, data=self._get('/expense_categories/{0}'.format(expense_category_id)))
+        return self._from_dict(data_class=ExpenseCategory, data=self._get('/expense_categories/{0}'.format(expense_category_id)))
 
     def create_expense_category(self, name, **kwargs):
         url = '/expense_categories'
         kwargs.update({'name': name})
-        return from_dict(data_class=ExpenseCategory, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=ExpenseCategory, data=self._post(url, data=kwargs))
 
     def update_expense_category(self, expense_category_id, **kwargs):
         url = '/expense_categories/{0}'.format(expense_category_id)
-        return from_dict(data_class=ExpenseCategory, data=self._patch(url, data=kwargs))
+        return self._from_dict(data_class=ExpenseCategory, data=self._patch(url, data=kwargs))
 
     def delete_expense_category(self, expense_category_id):
         self._delete('/expense_categories/{0}'.format(expense_category_id))
@@ -513,22 +691,28 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=Tasks, data=self._get(url))
+        return self._from_dict(data_class=Tasks, data=self._get(url))
+
+    def iter_tasks(self, **kwargs):
+        return self._iter_items(self.tasks, **kwargs)
 
     def get_task(self, task_id):
-        return from_dict(data_class=Task, data=self._get('/tasks/{0}'.format(task_id)))
+        return self._get_reference('task', task_id, Task, '/tasks/{0}'.format(task_id))
 
     def create_task(self, name, **kwargs):
         url = '/tasks'
         kwargs.update({'name': name})
-        return from_dict(data_class=Task, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=Task, data=self._post(url, data=kwargs))
 
     def update_task(self, task_id, **kwargs):
         url = '/tasks/{0}'.format(task_id)
-        return from_dict(data_class=Task, data=self._patch(url, data=kwargs))
+        response = self._patch(url, data=kwargs)
+        self._invalidate_reference('task', task_id)
+        return self._from_dict(data_class=Task, data=response)
 
     def delete_task(self, task_id):
         self._delete('/tasks/{0}'.format(task_id))
+        self._invalidate_reference('task', task_id)
 
     ## Time Entries
 
@@ -551,15 +735,18 @@ class Harvest(object):
         if from_date is not None:
             url = '{0}&from={1}'.format(url, from_date)
         if to_date is not None:
-            url = '{0}&to_date={1}'.format(url, to_date)
+            url = '{0}&to={1}'.format(url, to_date)
+
+        return self._from_dict(data_class=TimeEntries, data=self._get(url))
 
-        return from_dict(data_class=TimeEntries, data=self._get(url))
+    def iter_time_entries(self, **kwargs):
+        return self._iter_items(self.time_entries, **kwargs)
 
     def get_time_entry(self, time_entry_id):
-        return from_dict(data_class=TimeEntry, data=self._get('/time_entries/{0}'.format(time_entry_id)))
+        return self._from_dict(data_class=TimeEntry, data=self._get('/time_entries/{0}'.format(time_entry_id)))
 
     def create_time_entry(self, wants_timestamp_timers, project_id, task_id, spent_date, **kwargs):
-        company = self.company()
+        company = self.with_response_format('dataclass').company()
 
         if company.wants_timestamp_timers == wants_timestamp_timers:
             url = '/time_entries'
@@ -567,9 +754,9 @@ class Harvest(object):
             response = self._post(url, data=kwargs)
 
             if 'message' in response.keys():
-                return from_dict(data_class=ErrorMessage, data=response)
+                return self._from_dict(data_class=ErrorMessage, data=response)
 
-            return from_dict(data_class=TimeEntry, data=response)
+            return self._from_dict(data_class=TimeEntry, data=response)
         else:
             return ErrorMessage("Your user account does not have permission to create a time entry this way.")
 
@@ -581,7 +768,7 @@ class Harvest(object):
 
     def update_time_entry(self, time_entry_id, **kwargs):
         url = '/time_entries/{0}'.format(time_entry_id)
-        return from_dict(data_class=TimeEntry, data=self._patch(url, data=kwargs))
+        return self._from_dict(data_class=TimeEntry, data=self._patch(url, data=kwargs))
 
     def delete_time_entry_external_reference(self, time_entry_id):
         self._delete('/time_entries/{0}/external_reference'.format(time_entry_id))
@@ -590,10 +777,10 @@ class Harvest(object):
         self._delete('/time_entries/{0}'.format(time_entry_id))
 
     def restart_a_stopped_time_entry(self, time_entry_id):
-        return from_dict(data_class=TimeEntry, data=self._patch('/time_entries/{0}/restart'.format(time_entry_id)))
+        return self._from_dict(data_class=TimeEntry, data=self._patch('/time_entries/{0}/restart'.format(time_entry_id)))
 
     def stop_a_running_time_entry(self, time_entry_id):
-        return from_dict(data_class=TimeEntry, data=self._patch('/time_entries/{0}/stop'.format(time_entry_id)))
+        return self._from_dict(data_class=TimeEntry, data=self._patch('/time_entries/{0}/stop'.format(time_entry_id)))
 
     ## Projects
 
@@ -606,7 +793,10 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=UserAssignments, data=self._get(url))
+        return self._from_dict(data_class=UserAssignments, data=self._get(url))
+
+    def iter_user_assignments(self, **kwargs):
+        return self._iter_items(self.user_assignments, **kwargs)
 
     def project_user_assignments(self, project_id, page=1, per_page=100, is_active=None, updated_since=None):
         url = '/projects/{0}/user_assignments'.format(project_id)
@@ -618,19 +808,22 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=UserAssignments, data=self._get(url))
+        return self._from_dict(data_class=UserAssignments, data=self._get(url))
+
+    def iter_project_user_assignments(self, project_id, **kwargs):
+        return self._iter_items(self.project_user_assignments, project_id, **kwargs)
 
     def get_user_assignment(self, project_id, user_assignment_id):
-        return from_dict(data_class=UserAssignment, data=self._get('/projects/{0}/user_assignments/{1}'.format(project_id, user_assignment_id)))
+        return self._from_dict(data_class=UserAssignment, data=self._get('/projects/{0}/user_assignments/{1}'.format(project_id, user_assignment_id)))
 
     def create_user_assignment(self, project_id, user_id, **kwargs):
         url = '/projects/{0}/user_assignments'.format(project_id)
         kwargs.update({'user_id': user_id})
-        return from_dict(data_class=UserAssignment, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=UserAssignment, data=self._post(url, data=kwargs))
 
     def update_user_assignment(self, project_id, user_assignment_id, **kwargs):
         url = '/projects/{0}/user_assignments/{1}'.format(project_id, user_assignment_id)
-        return from_dict(data_class=UserAssignment, data=self._patch(url, data=kwargs))
+        return self._from_dict(data_class=UserAssignment, data=self._patch(url, data=kwargs))
 
     def delete_user_assignment(self, project_id, user_assignment_id):
         self._delete('/projects/{0}/user_assignments/{1}'.format(project_id, user_assignment_id))
@@ -644,7 +837,10 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=TaskAssignments, data=self._get(url))
+        return self._from_dict(data_class=TaskAssignments, data=self._get(url))
+
+    def iter_task_assignments(self, **kwargs):
+        return self._iter_items(self.task_assignments, **kwargs)
 
     def project_task_assignments(self, project_id, page=1, per_page=100, is_active=None, updated_since=None):
         url = '/projects/{0}/task_assignments'.format(project_id)
@@ -656,10 +852,13 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=TaskAssignments, data=self._get(url))
+        return self._from_dict(data_class=TaskAssignments, data=self._get(url))
+
+    def iter_project_task_assignments(self, project_id, **kwargs):
+        return self._iter_items(self.project_task_assignments, project_id, **kwargs)
 
     def get_task_assignment(self, project_id, task_assignment_id):
-        return from_dict(data_class=TaskAssignment, data=self._get('/projects/{0}/task_assignments/{1}'.format(project_id, task_assignment_id)))
+        return self._from_dict(data_class=TaskAssignment, data=self._get('/projects/{0}/task_assignments/{1}'.format(project_id, task_assignment_id)))
 
     def create_task_assignment(self, project_id, task_id, **kwargs):
         url = '/projects/{0}/task_assignments'.format(project_id)
@@ -668,13 +867,13 @@ class Harvest(object):
         response = self._post(url, data=kwargs)
 
         if 'message' in response.keys():
-            return from_dict(data_class=ErrorMessage, data=response)
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=TaskAssignment, data=response)
+        return self._from_dict(data_class=TaskAssignment, data=response)
 
     def update_task_assignment(self, project_id, task_assignment_id, **kwargs):
         url = '/projects/{0}/task_assignments/{1}'.format(project_id, task_assignment_id)
-        return from_dict(data_class=TaskAssignment, data=self._patch(url, data=kwargs))
+        return self._from_dict(data_class=TaskAssignment, data=self._patch(url, data=kwargs))
 
     def delete_task_assignment(self, project_id, task_assignment_id):
         self._delete('/projects/{0}/task_assignments/{1}'.format(project_id, task_assignment_id))
@@ -690,22 +889,28 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=Projects, data=self._get(url))
+        return self._from_dict(data_class=Projects, data=self._get(url))
+
+    def iter_projects(self, **kwargs):
+        return self._iter_items(self.projects, **kwargs)
 
     def get_project(self, project_id):
-        return from_dict(data_class=Project, data=self._get('/projects/{0}'.format(project_id)))
+        return self._get_reference('project', project_id, Project, '/projects/{0}'.format(project_id))
 
     def create_project(self, client_id, name, is_billable, bill_by, budget_by, **kwargs):
         url = '/projects'
         kwargs.update({'client_id': client_id, 'name': name, 'is_billable': is_billable, 'bill_by': bill_by, 'budget_by': budget_by})
-        return from_dict(data_class=Project, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=Project, data=self._post(url, data=kwargs))
 
     def update_project(self, project_id, **kwargs):
         url = '/projects/{0}'.format(project_id)
-        return from_dict(data_class=Project, data=self._patch(url, data=kwargs))
+        response = self._patch(url, data=kwargs)
+        self._invalidate_reference('project', project_id)
+        return self._from_dict(data_class=Project, data=response)
 
     def delete_project(self, project_id):
         self._delete('/projects/{0}'.format(project_id))
+        self._invalidate_reference('project', project_id)
 
      ## Roles
 
@@ -713,20 +918,23 @@ class Harvest(object):
         url = '/roles?page={0}'.format(page)
         url = '{0}&per_page={1}'.format(url, per_page)
 
-        return from_dict(data_class=Roles, data=self._get(url))
+        return self._from_dict(data_class=Roles, data=self._get(url))
+
+    def iter_roles(self, **kwargs):
+        return self._iter_items(self.roles, **kwargs)
 
     def get_role(self, role_id):
-        return from_dict(data_class=Role, data=self._get('/roles/{0}'.format(role_id)))
+        return self._from_dict(data_class=Role, data=self._get('/roles/{0}'.format(role_id)))
 
     def create_role(self, name, **kwargs):
         url = '/roles'
         kwargs.update({'name': name})
-        return from_dict(data_class=Role, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=Role, data=self._post(url, data=kwargs))
 
     def update_role(self, role_id, name, **kwargs):
         url = '/roles/{0}'.format(role_id)
         kwargs.update({'name': name})
-        return from_dict(data_class=Role, data=self._patch(url, data=kwargs))
+        return self._from_dict(data_class=Role, data=self._patch(url, data=kwargs))
 
     def delete_role(self, role_id):
         self._delete('/roles/{0}'.format(role_id))
@@ -738,32 +946,38 @@ class Harvest(object):
         url = '{0}?page={1}'.format(url, page)
         url = '{0}&per_page={1}'.format(url, per_page)
 
-        return from_dict(data_class=BillableRates, data=self._get(url))
+        return self._from_dict(data_class=BillableRates, data=self._get(url))
+
+    def iter_billable_rates(self, user_id, **kwargs):
+        return self._iter_items(self.billable_rates, user_id, **kwargs)
 
     def get_billable_rate(self, user_id, billable_rate_id):
         url = '/users/{0}/billable_rates/{1}'.format(user_id, billable_rate_id)
-        return from_dict(data_class=BillableRate, data=self._get(url))
+        return self._from_dict(data_class=BillableRate, data=self._get(url))
 
     def create_billable_rate(self, user_id, amount, **kwargs):
         url = '/users/{0}/billable_rates'.format(user_id)
         kwargs.update({'amount': amount})
-        return from_dict(data_class=BillableRate, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=BillableRate, data=self._post(url, data=kwargs))
 
     def user_cost_rates(self, user_id, page=1, per_page=100):
         url = '/users/{0}/cost_rates'.format(user_id)
         url = '{0}?page={1}'.format(url, page)
         url = '{0}&per_page={1}'.format(url, per_page)
 
-        return from_dict(data_class=UserCostRates, data=self._get(url))
+        return self._from_dict(data_class=UserCostRates, data=self._get(url))
+
+    def iter_user_cost_rates(self, user_id, **kwargs):
+        return self._iter_items(self.user_cost_rates, user_id, **kwargs)
 
     def get_user_cost_rate(self, user_id, cost_rate_id):
         url = '/users/{0}/cost_rates/{1}'.format(user_id, cost_rate_id)
-        return from_dict(data_class=CostRate, data=self._get(url))
+        return self._from_dict(data_class=CostRate, data=self._get(url))
 
     def create_user_cost_rate(self, user_id, amount, **kwargs):
         url = '/users/{0}/cost_rates'.format(user_id)
         kwargs.update({'amount': amount})
-        return from_dict(data_class=CostRate, data=self._post(url, data=kwargs))
+        return self._from_dict(data_class=CostRate, data=self._post(url, data=kwargs))
 
     def project_assignments(self, user_id, page=1, per_page=100, updated_since=None):
         url = '/users/{0}/project_assignments'.format(user_id)
@@ -773,13 +987,19 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=ProjectAssignments, data=self._get(url))
+        return self._from_dict(data_class=ProjectAssignments, data=self._get(url))
+
+    def iter_project_assignments(self, user_id, **kwargs):
+        return self._iter_items(self.project_assignments, user_id, **kwargs)
 
     def my_project_assignments(self, page=1, per_page=100):
         url = '/users/me/project_assignments?page={0}'.format(page)
         url = '{0}&per_page={1}'.format(url, per_page)
 
-        return from_dict(data_class=ProjectAssignments, data=self._get(url))
+        return self._from_dict(data_class=ProjectAssignments, data=self._get(url))
+
+    def iter_my_project_assignments(self, **kwargs):
+        return self._iter_items(self.my_project_assignments, **kwargs)
 
     def users(self, page=1, per_page=100, is_active=None, updated_since=None):
         url = '/users?page={0}'.format(page)
@@ -790,13 +1010,16 @@ class Harvest(object):
         if updated_since is not None:
             url = '{0}&updated_since={1}'.format(url, updated_since)
 
-        return from_dict(data_class=Users, data=self._get(url))
+        return self._from_dict(data_class=Users, data=self._get(url))
+
+    def iter_users(self, **kwargs):
+        return self._iter_items(self.users, **kwargs)
 
     def get_user(self, user_id):
-        return from_dict(data_class=User, data=self._get('/users/{0}'.format(user_id)))
+        return self._get_reference('user', user_id, User, '/users/{0}'.format(user_id))
 
     def get_currently_authenticated_user(self):
-        return from_dict(data_class=User, data=self._get('/users/me'))
+        return self._from_dict(data_class=User, data=self._get('/users/me'))
 
     def create_user(self, first_name, last_name, email, **kwargs):
         url = '/users'
@@ -804,77 +1027,257 @@ class Harvest(object):
         response = self._post(url, data=kwargs)
 
         if 'message' in response.keys():
-            return from_dict(data_class=ErrorMessage, data=response)
+            return self._from_dict(data_class=ErrorMessage, data=response)
 
-        return from_dict(data_class=User, data=response)
+        return self._from_dict(data_class=User, data=response)
 
     def update_user(self, user_id, **kwargs):
         url = '/users/{0}'.format(user_id)
-        return from_dict(data_class=User, data=self._patch(url, data=kwargs))
+        response = self._patch(url, data=kwargs)
+        self._invalidate_reference('user', user_id)
+        return self._from_dict(data_class=User, data=response)
 
     def delete_user(self, user_id):
         self._delete('/users/{0}'.format(user_id))
+        self._invalidate_reference('user', user_id)
 
-    def _get(self, path='/', data=None):
-        return self._request('GET', path, data)
+    # cached per response format as each format gives a different object.
+    # json callers get a copy they're free to change, as from the cache.
+    def _get_reference(self, kind, reference_id, data_class, url):
+        if self.__reference_cache is None:
+            return self._from_dict(data_class=data_class, data=self._get(url))
 
-    def _post(self, path='/', data=None, files=None):
-        return self._request('POST', path, data, files)
+        key = (str(reference_id), self.response_format)
+        value = self.__reference_cache.get(kind, key)
+        if value is None:
+            value = self._from_dict(data_class=data_class, data=self._get(url))
+            self.__reference_cache.set(kind, key, value)
 
-    def _delete(self, path='/', data=None):
-        return self._request('DELETE', path, data)
+        if isinstance(value, (dict, list)):
+            return copy.deepcopy(value)
+        return value
 
-    def _patch(self, path='/', data=None, files=None):
-        return self._request('PATCH', path, data, files)
+    def _invalidate_reference(self, kind, reference_id):
+        if self.__reference_cache is not None:
+            for response_format in self.RESPONSE_FORMATS:
+                self.__reference_cache.delete(kind, (str(reference_id), response_format))
 
-    def _request(self, method='GET', path='/', data=None, files=None):
-        url = '{self.uri}{path}'.format(self=self, path=path)
+    def _from_dict(self, data_class, data):
+        if self.response_format in ('json', 'bytes'):
+            return data
 
-        kwargs = {
-            'method': method,
-            'url': '{self.uri}{path}'.format(self=self, path=path),
-            'headers': copy.deepcopy(self.__headers)
-        }
+        if self.response_format == 'slotted':
+            data_class = slotted(data_class)
 
-        if files is not None:
-            del(kwargs['headers']['Content-Type'])
-            kwargs['files'] = files
-            kwargs['data'] = data
-        else:
-            kwargs['data'] = json.dumps(data)
+        return from_dict(data_class=data_class, data=data, lazy=self.response_format == 'lazy')
+
+    # Yields the entities of a list method one at a time, following
+    # links.next so only one page is held in memory.
+    def _iter_items(self, method, *args, **kwargs):
+        # pages have to be parsed to follow them
+        if self.response_format == 'bytes':
+            client = self.with_response_format('json')
+            yield from client._iter_items(getattr(client, method.__name__), *args, **kwargs)
+            return
+
+        for page in self._iter_pages(method, *args, **kwargs):
+            yield from page_items(page)
 
-        requestor = requests
+    # first_page is page 1 of the same query when it was already fetched
+    def _iter_pages(self, method, *args, first_page=None, **kwargs):
+        page = first_page if first_page is not None else method(*args, **kwargs)
 
-        # request throttling
-        now = datetime.now()
-        self.request_throttle.append(now)
-        oldest_time = self.request_throttle.popleft()
-        aged_delta = now - oldest_time
+        while True:
+            yield page
 
-        if aged_delta <= self.time_limit:
-            self.request_throttle.appendleft(oldest_time)
+            links = page_value(page, 'links')
+            next_url = links['next'] if isinstance(links, dict) else getattr(links, 'next', None)
+            if next_url is None:
+                return
 
-            # 15 is from the Harvest API doco https://help.getharvest.com/api-v2/introduction/overview/general/
-            if (len(self.request_throttle) > 100):
-                time.sleep(self.RATE_LIMIT_DURATION_SECONDS * (aged_delta / self.time_limit))
+            page = self._from_dict(data_class=type(page), data=self._get(next_url))
 
+    def _get(self, path='/', data=None):
+        return self._request('GET', path, data, raw=self.response_format == 'bytes')
+
+    def _post(self, path='/', data=None, files=None):
+        return self._request('POST', path, data, files)
+
+    def _delete(self, path='/', data=None):
+        return self._request('DELETE', path, data)
+
+    def _patch(self, path='/', data=None, files=None):
+        return self._request('PATCH', path, data, files)
+
+    # Works out once what requests.Session.request would on every call: the
+    # session and Harvest headers merged, with and without the JSON
+    # Content-Type (uploads get a multipart one from requests), and the
+    # proxy, TLS and netrc settings from the environment.
+    def _build_request_template(self):
+        headers = CaseInsensitiveDict(self.__session.headers)
+        headers.update(self.__headers)
+        multipart_headers = headers.copy()
+        del multipart_headers['Content-Type']
+
+        self.__json_headers = headers
+        self.__multipart_headers = multipart_headers
+        self.__send_settings = self.__session.merge_environment_settings(self.__uri, {}, None, None, None)
+
+    # Sends the request, within the rate limit, retrying as the retry policy allows
+    def _send(self, request, retry=True):
+        method = request.method
+        attempt = 0
+
+        while True:
+            # request throttling
+            self.__rate_limiter.acquire()
+
+            try:
+                resp = self.__session.send(request, **self.__send_settings)
+            except requests.exceptions.RequestException as e:
+                if not (retry and self.__retry_policy.should_retry(method, attempt, exception=e)):
+                    raise
+                self.__retry_policy.sleep(self.__retry_policy.backoff(attempt))
+                attempt += 1
+                continue
+
+            self.__transfer_stats.record(resp)
+
+            if not (retry and self.__retry_policy.should_retry(method, attempt, status=resp.status_code)):
+                # the error body isn't a response to decode
+                if retry and self.__retry_policy.exhausted(method, attempt, resp.status_code):
+                    raise HarvestError('{0} {1} failed with {2} after {3} retries: {4}'.format(method, request.url, resp.status_code, attempt, resp.text))
+                return resp
+
+            retry_after = retry_after_seconds(resp)
+            delay = self.__retry_policy.backoff(attempt, retry_after)
+
+            # Harvest has told us how long the token is blocked for so hold
+            # back every caller sharing the limiter, not just this one
+            if retry_after is not None and hasattr(self.__rate_limiter, 'pause'):
+                self.__rate_limiter.pause(delay)
+            else:
+                self.__retry_policy.sleep(delay)
+
+            attempt += 1
+
+    # raw returns the response body as it is
+    def _request(self, method='GET', path='/', data=None, files=None, raw=False):
         # "auto" refresh_token. Currently only works on Authorization Code flow
         if isinstance(self.__auth, OAuth2_ServerSide) and (datetime.utcfromtimestamp(self.__auth.token.expires_at) <= datetime.now()):
             new_session = OAuth2Session(client_id=self.__auth.client_id, token=asdict(self.__auth.token))
             oauth_token = new_session.refresh_token(self.__auth.refresh_url, client_id=self.__auth.client_id, client_secret=self.__auth.client_secret)
-            self.__auth = from_dict(data_class=OAuth2_ServerSide_Token, data=oauth_token)
+            self.__auth.token = from_dict(data_class=OAuth2_ServerSide_Token, data=oauth_token)
+            self.__headers['Authorization'] = self.__auth.token.access_token
+            self._build_request_template()
+
+        # copies, eg. from with_response_format, share the auth, so one of
+        # them may have refreshed the token since this template was built
+        elif isinstance(self.__auth, OAuth2_ServerSide) and self.__json_headers.get('Authorization') != self.__auth.token.access_token:
+            self.__headers['Authorization'] = self.__auth.token.access_token
+            self._build_request_template()
+
+        # links.next and friends are already absolute
+        if '://' in path:
+            url = path
+        else:
+            url = self.__uri + path
+
+        request = requests.PreparedRequest()
+        if files is not None:
+            request.prepare(method=method, url=url, headers=self.__multipart_headers, files=files, data=data, cookies=self.__session.cookies, hooks=self.__session.hooks)
+        else:
+            request.prepare(method=method, url=url, headers=self.__json_headers, data=self.__codec.dumps(data), cookies=self.__session.cookies, hooks=self.__session.hooks)
+
+        key = entry = None
+        if self.__cache is not None and method == 'GET':
+            key = cache_key(url, self.__headers)
+            entry = self.__cache.get(key)
+            if entry is not None:
+                if entry.etag is not None:
+                    request.headers['If-None-Match'] = entry.etag
+                if entry.last_modified is not None:
+                    request.headers['If-Modified-Since'] = entry.last_modified
 
         try:
-            resp = requestor.request(**kwargs)
+            # uploaded files are streams which can't be replayed
+            resp = self._send(request, retry=files is None)
+
+            if key is not None:
+                if resp.status_code == 304 and entry is not None:
+                    return self._cached_body(entry, raw)
+                entry = self._cache_response(key, resp)
+
+            if raw:
+                return resp.content
             if 'DELETE' not in method:
                 try:
-                    return resp.json()
+                    # straight from the bytes, without decoding to str first
+                    data = self.__codec.loads(resp.content)
                 except:
                     return resp
+                # json callers get a copy they're free to change
+                if entry is not None and self.response_format != 'json':
+                    entry.data = data
+                return data
             return resp
+        except HarvestError:
+            raise
         except Exception as e:
             raise HarvestError(e)
 
+    def _cache_response(self, key, resp):
+        etag = resp.headers.get('ETag')
+        last_modified = resp.headers.get('Last-Modified')
+
+        if resp.status_code != 200:
+            return None
+
+        # a newer body which can't be revalidated replaces any older one, whose
+        # validators could otherwise get a 304 and serve it again
+        if (etag is None and last_modified is None) or 'no-store' in resp.headers.get('Cache-Control', ''):
+            self.__cache.delete(key)
+            return None
+
+        entry = CacheEntry(etag, last_modified, resp.content)
+        self.__cache.set(key, entry)
+        return entry
+
+    def _cached_body(self, entry, raw):
+        if raw:
+            return entry.body
+        if entry.data is not None and self.response_format != 'json':
+            return entry.data
+        return self.__codec.loads(entry.body)
+
+_page_fields = frozenset(page_field.name for page_field in fields(BasePage))
+
+# The entities of a page are its one field which isn't set by __init__.
+# page may also be the page as JSON, parsed or not.
+def page_items(page):
+    if isinstance(page, bytes):
+        page = json.loads(page)
+
+    if isinstance(page, dict):
+        for key, value in page.items():
+            if key not in _page_fields and isinstance(value, list):
+                return value
+        return []
+
+    for page_field in fields(page):
+        if not page_field.init:
+            return getattr(page, page_field.name)
+
+# eg. total_pages or links, of a page in any of the response formats
+def page_value(page, name):
+    if isinstance(page, bytes):
+        page = json.loads(page)
+
+    if isinstance(page, dict):
+        return page.get(name)
+
+    return getattr(page, name)
+
 def remove_nones(obj):
   if isinstance(obj, (list, tuple, set)):
     return type(obj)(remove_nones(x) for x in obj if x is not None)
@@ -0,0 +1,158 @@
+
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import closing
+
+class SlidingWindowRateLimiter(object):
+    """Allows at most max_requests in any window of period seconds.
+
+    The timestamps of the last max_requests requests are kept so the full
+    budget can be used back to back and a caller only waits for the oldest
+    request to age out of the window. Safe to share between threads.
+
+    pause() holds every caller back, eg. for a Retry-After from Harvest.
+
+    Any object with acquire() and wait_time() can be used in its place,
+    pause() is optional."""
+
+    def __init__(self, max_requests, period, clock=time.monotonic, sleep=time.sleep):
+        self.max_requests = max_requests
+        self.period = period
+        self.__clock = clock
+        self.__sleep = sleep
+        self.__requests = deque()
+        self.__paused_until = 0.0
+        self.__lock = threading.Lock()
+
+    def _wait_time(self, now):
+        if self.__paused_until > now:
+            return self.__paused_until - now
+
+        while self.__requests and self.__requests[0] <= now - self.period:
+            self.__requests.popleft()
+
+        if len(self.__requests) < self.max_requests:
+            return 0.0
+
+        return self.__requests[0] + self.period - now
+
+    def wait_time(self):
+        with self.__lock:
+            return self._wait_time(self.__clock())
+
+    def pause(self, seconds):
+        with self.__lock:
+            self.__paused_until = max(self.__paused_until, self.__clock() + seconds)
+
+    def acquire(self):
+        while True:
+            with self.__lock:
+                now = self.__clock()
+                wait = self._wait_time(now)
+
+                if wait <= 0:
+                    self.__requests.append(now)
+                    return
+
+            self.__sleep(wait)
+
+class SQLiteRateLimiter(object):
+    """SlidingWindowRateLimiter for several processes on one host.
+
+    Request timestamps are kept in the SQLite database at path, keyed by
+    account id and token, so every process (gunicorn workers, cron jobs
+    and so on) using the same token splits one budget. The token is only
+    stored as a hash."""
+
+    def __init__(self, path, account_id, access_token, max_requests=100, period=15, clock=time.time, sleep=time.sleep, timeout=30):
+        self.path = path
+        self.max_requests = max_requests
+        self.period = period
+        self.key = hashlib.sha256('{0}:{1}'.format(account_id, access_token).encode('utf-8')).hexdigest()
+        self.__clock = clock
+        self.__sleep = sleep
+        self.__timeout = timeout
+
+        with closing(self._connect()) as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS requests (key TEXT NOT NULL, requested_at REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS requests_key ON requests (key, requested_at)')
+            connection.execute('CREATE TABLE IF NOT EXISTS pauses (key TEXT PRIMARY KEY, paused_until REAL NOT NULL)')
+
+    # autocommit mode, transactions are begun explicitly and closing the
+    # connection without a COMMIT rolls back
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=self.__timeout, isolation_level=None)
+
+    def _wait_time(self, connection, now):
+        paused = connection.execute('SELECT paused_until FROM pauses WHERE key = ?', (self.key,)).fetchone()
+        if paused is not None and paused[0] > now:
+            return paused[0] - now
+
+        connection.execute('DELETE FROM requests WHERE key = ? AND requested_at <= ?', (self.key, now - self.period))
+        count, oldest = connection.execute('SELECT COUNT(*), MIN(requested_at) FROM requests WHERE key = ?', (self.key,)).fetchone()
+
+        if count < self.max_requests:
+            return 0.0
+
+        return oldest + self.period - now
+
+    def wait_time(self):
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            wait = self._wait_time(connection, self.__clock())
+            connection.execute('COMMIT')
+
+        return wait
+
+    def pause(self, seconds):
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            paused_until = self.__clock() + seconds
+            connection.execute('INSERT OR REPLACE INTO pauses (key, paused_until) VALUES (?, MAX(?, COALESCE((SELECT paused_until FROM pauses WHERE key = ?), 0)))', (self.key, paused_until, self.key))
+            connection.execute('COMMIT')
+
+    def acquire(self):
+        while True:
+            with closing(self._connect()) as connection:
+                # BEGIN IMMEDIATE takes the write lock up front so no other
+                # process can claim the same slot between the count and insert
+                connection.execute('BEGIN IMMEDIATE')
+                now = self.__clock()
+                wait = self._wait_time(connection, now)
+
+                if wait <= 0:
+                    connection.execute('INSERT INTO requests (key, requested_at) VALUES (?, ?)', (self.key, now))
+
+                connection.execute('COMMIT')
+
+            if wait <= 0:
+                return
+
+            self.__sleep(wait)
+
+_shared_rate_limiters = {}
+_shared_rate_limiters_lock = threading.Lock()
+
+# One limiter per key, eg. account id and token, for the life of the process.
+def shared_rate_limiter(key, max_requests, period):
+    with _shared_rate_limiters_lock:
+        if key not in _shared_rate_limiters:
+            _shared_rate_limiters[key] = SlidingWindowRateLimiter(max_requests, period)
+
+        return _shared_rate_limiters[key]
@@ -13,83 +13,395 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import calendar
 import itertools
+import math
+import queue
+import threading
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
 
 from harvest import Harvest
+from .cache import ReferenceCache
+from .columnar import ColumnarTimeReport
+from .harvest import HarvestError, page_value
 from .harvestdataclasses import *
 
-class Reports(Harvest):
-
-    def __init__(self, *argsv, **kwargs):
-        super(Reports, self).__init__(*argsv, **kwargs)
-        self.client_cache = {}
-        self.project_cache = {}
-        self.task_cache = {}
-        self.user_cache = {}
+@dataclass
+class QueryPlan:
+    """How Reports fetches the time entries matching any of configs.
+
+    fan-out runs every config as a query of its own, broad runs
+    broad_config once and filters the entries locally. The estimates are
+    request counts, broad_requests from total_entries of the probe, page
+    1 of broad_config. fan_out_requests is a lower bound, at least a page
+    per config. With a window every query is sharded, each shard is at
+    least a page, and the probe of a broad plan can't be reused so is
+    counted in broad_requests."""
+    strategy: str
+    configs: List[dict]
+    broad_config: Optional[dict]
+    total_entries: Optional[int]
+    fan_out_requests: int
+    broad_requests: Optional[int]
+    window: Optional[str] = None
+    probe: object = field(default=None, repr=False, compare=False)
+    filters: Optional[dict] = field(default=None, repr=False, compare=False)
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+def _month_end(day):
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+def _as_date(value):
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+# Splits from_date to to_date, inclusive, into day, week or month long
+# windows. Months follow the calendar, the first and last are clipped.
+def date_windows(from_date, to_date, window):
+    start = _as_date(from_date)
+    to_date = _as_date(to_date)
+
+    windows = []
+    while start <= to_date:
+        if window == 'day':
+            end = start
+        elif window == 'week':
+            end = start + timedelta(days=6)
+        elif window == 'month':
+            end = _month_end(start)
+        else:
+            raise HarvestError('Invalid window "{0}".'.format(window))
+
+        end = min(end, to_date)
+        windows.append((start.isoformat(), end.isoformat()))
+        start = end + timedelta(days=1)
+
+    return windows
+
+# Runs the pages generator in a thread at most buffer_size pages ahead of
+# the consumer, the thread waits while the buffer is full. Closing the
+# returned generator stops the thread.
+def prefetch(pages, buffer_size):
+    buffer = queue.Queue(maxsize=buffer_size)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for page in pages:
+                if not put((page, None)):
+                    return
+        except BaseException as e:
+            put((done, e))
+            return
+        put((done, None))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            page, error = buffer.get()
+            if page is done:
+                if error is not None:
+                    raise error
+                return
+            yield page
+    finally:
+        stopped.set()
+        producer.join()
 
-    def timeframe(self, timeframe, from_date = None, to_date = None):
+class Reports(Harvest):
 
-        if timeframe == 'This Week':
-            return {'from' : None, 'to' : None}
+    # time_entries filters and the field of a time entry they match
+    FILTER_FIELDS = {'client_id': 'client', 'project_id': 'project', 'user_id': 'user'}
 
-        elif timeframe == 'Last Week':
-            pass
+    # the most time_entries will return a page, per the Harvest API doco, so
+    # the broad query makes as few round trips as it can
+    BROAD_PER_PAGE = 2000
 
-        elif timeframe == 'This Semimonth':
-            pass
+    # grouped_time's group_by, in any case, and the field it groups by
+    GROUP_BY = {'date': 'date', 'week': 'week', 'month': 'month', 'client': 'client', 'project': 'project', 'task': 'task', 'user': 'user', 'person': 'user', 'team': 'user'}
 
-        elif timeframe == 'Last Semimonth':
-            pass
+    def __init__(self, *argsv, **kwargs):
+        # reports look the same users, projects and so on up over and over,
+        # unless told otherwise with reference_cache=None
+        if 'reference_cache' not in kwargs:
+            kwargs['reference_cache'] = ReferenceCache()
+        super(Reports, self).__init__(*argsv, **kwargs)
+        self.__users_swept = False
+        self.week_start_day = None
+
+    # The from_date and to_date of time_entries for a time frame of the
+    # Harvest reports. Weeks start on the company's week_start_day, which
+    # is looked up the first time it's needed unless set beforehand. The
+    # current week, month and so on end today, there's nothing after it to
+    # fetch (and no shards to query for it).
+    def timeframe(self, timeframe, from_date = None, to_date = None, today = None):
+        if today is None:
+            today = date.today()
+        until = today
+
+        if timeframe in ('This Week', 'Last Week'):
+            start = today - timedelta(days=(today.weekday() - WEEKDAYS.index(self._week_start_day())) % 7)
+            if timeframe == 'Last Week':
+                start -= timedelta(days=7)
+            end = start + timedelta(days=6)
+
+        elif timeframe in ('This Semimonth', 'Last Semimonth'):
+            if timeframe == 'Last Semimonth':
+                today = today.replace(day=1) if today.day > 15 else today.replace(day=1) - timedelta(days=1)
+            if today.day <= 15:
+                start, end = today.replace(day=1), today.replace(day=15)
+            else:
+                start, end = today.replace(day=16), _month_end(today)
 
         elif timeframe == 'This Month':
-            pass
+            start, end = today.replace(day=1), _month_end(today)
 
         elif timeframe == 'Last Month':
-            pass
-
-        elif timeframe == 'This Quarter':
-            pass
+            end = today.replace(day=1) - timedelta(days=1)
+            start = end.replace(day=1)
 
-        elif timeframe == 'Last Quarter':
-            pass
+        elif timeframe in ('This Quarter', 'Last Quarter'):
+            start = today.replace(month=3 * ((today.month - 1) // 3) + 1, day=1)
+            if timeframe == 'Last Quarter':
+                start = (start - timedelta(days=1)).replace(day=1)
+                start = start.replace(month=3 * ((start.month - 1) // 3) + 1)
+            end = _month_end(start.replace(month=start.month + 2))
 
         elif timeframe == 'This Year':
-            pass
+            start, end = today.replace(month=1, day=1), today.replace(month=12, day=31)
 
         elif timeframe == 'Last Year':
-            pass
+            start, end = date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)
 
         elif timeframe == 'All Time':
             return {}
 
         elif timeframe == 'Custom':
-            pass
+            bounds = {}
+            if from_date is not None:
+                bounds['from_date'] = _as_date(from_date).isoformat()
+            if to_date is not None:
+                bounds['to_date'] = _as_date(to_date).isoformat()
+            return bounds
+
+        else:
+            raise HarvestError('Invalid timeframe "{0}".'.format(timeframe))
+
+        return {'from_date': start.isoformat(), 'to_date': min(end, until).isoformat()}
+
+    def _week_start_day(self):
+        if self.week_start_day is None:
+            self.week_start_day = self.company().week_start_day
+        return self.week_start_day
+
+    # Splits each config bounded by from_date and to_date into one per
+    # window, see date_windows
+    def shard_configs(self, configs, window):
+        if window is None:
+            return configs
 
+        sharded = []
+        for config in configs:
+            if config.get('from_date') is None or config.get('to_date') is None:
+                sharded.append(config)
+                continue
+
+            for from_date, to_date in date_windows(config['from_date'], config['to_date'], window):
+                sharded.append(dict(config, from_date=from_date, to_date=to_date))
+
+        return sharded
+
+    # The hours of a Harvest report as time_entries filters and the
+    # billable the entries must have as well, None for either. Harvest
+    # filters on is_billed server side, billable is left to the caller.
+    # is_billed is given as Harvest documents it, 'true' or 'false'.
     def show(self, hours):
 
         if hours == 'All Hours':
-            pass
+            return {}, None
 
         elif hours == 'Billable Hours':
-            pass
+            return {}, True
 
         elif hours == 'Non-Billable Hours':
-            pass
+            return {}, False
 
         elif hours == 'Uninvoiced Billable Hours':
-            pass
+            return {'is_billed': 'false'}, True
 
         elif hours == 'Uninvoiced Hours':
-            pass
+            return {'is_billed': 'false'}, None
 
         elif hours == 'Invoiced Hours':
-            pass
+            return {'is_billed': 'true'}, None
+
+        raise HarvestError('Invalid hours "{0}".'.format(hours))
+
+    # The users with user_ids by id, from the reference cache, so they expire
+    # and update_user and delete_user invalidate them as for get_user. The
+    # first time any are missing, and after that when several are, the whole
+    # user directory is swept with users(), which is a handful of requests
+    # however many users there are, into the cache. Ids still missing, eg.
+    # users who have left, are fetched concurrently with get_user.
+    def users_by_id(self, user_ids):
+        reference_cache = self.reference_cache
+
+        users = {}
+        if reference_cache is not None:
+            for user_id in set(user_ids):
+                user = reference_cache.get('user', (str(user_id), self.response_format))
+                if user is not None:
+                    users[user_id] = user
+        missing = set(user_ids) - users.keys()
+
+        if missing and (not self.__users_swept or len(missing) > 1):
+            for page in self.all_pages(self.users):
+                for user in page.users:
+                    if reference_cache is not None:
+                        reference_cache.set('user', (str(user.id), self.response_format), user)
+                    if user.id in missing:
+                        users[user.id] = user
+            self.__users_swept = True
+            missing -= users.keys()
+
+        if missing:
+            missing = list(missing)
+            with ThreadPoolExecutor(max_workers=self.pool_maxsize) as executor:
+                users.update(zip(missing, executor.map(self.get_user, missing)))
+
+        return {user_id: users[user_id] for user_id in user_ids}
+
+    # Runs time_entries for each of configs, the keyword arguments of one
+    # query, and merges the entries. Identical configs are run once, the
+    # rest concurrently, and an entry matched by several configs is kept
+    # once, in the order it was first seen. The rate limiter still applies.
+    def query_time_entries(self, configs, max_workers=None):
+        unique_configs = []
+        for config in configs:
+            if config not in unique_configs:
+                unique_configs.append(config)
+
+        if max_workers is None:
+            max_workers = self.pool_maxsize
+
+        # One pool for the queries and their pages, so no more than
+        # max_workers requests are in flight. Pages after the first are
+        # queued once every query's first page has given its total_pages.
+        time_entries = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            first_pages = list(executor.map(lambda config: self.time_entries(page=1, **config), unique_configs))
+            next_pages = [[executor.submit(self.time_entries, page=page, **config) for page in range(2, (page_value(first_page, 'total_pages') or 1) + 1)] for config, first_page in zip(unique_configs, first_pages)]
+
+            for first_page, pages in zip(first_pages, next_pages):
+                for page in [first_page] + [page.result() for page in pages]:
+                    for time_entry in page.time_entries:
+                        time_entries.setdefault(time_entry.id, time_entry)
+
+        return list(time_entries.values())
+
+    # Chooses between fanning configs out and one broad query filtered
+    # locally. The broad query is configs without their filters, when
+    # that's the same for every config the planner probes it for
+    # total_entries, the one request it makes. When the broad query is
+    # sharded the probe can't be reused so only asks for one entry.
+    def plan_time_entries(self, configs, per_page=BROAD_PER_PAGE, window=None):
+        unique_configs = []
+        for config in configs:
+            if config not in unique_configs:
+                unique_configs.append(config)
+
+        fan_out_requests = len(self.shard_configs(unique_configs, window))
+
+        broad_configs = []
+        for config in unique_configs:
+            broad_config = {key: value for key, value in config.items() if key not in self.FILTER_FIELDS}
+            if broad_config not in broad_configs:
+                broad_configs.append(broad_config)
+
+        # one query can't be beaten, differing timeframes can't be merged
+        if len(unique_configs) <= 1 or len(broad_configs) > 1:
+            return QueryPlan(strategy='fan-out', configs=unique_configs, broad_config=None, total_entries=None, fan_out_requests=fan_out_requests, broad_requests=None, window=window)
+
+        broad_config = broad_configs[0]
+        shards = len(self.shard_configs([broad_config], window))
+        probe = self.time_entries(page=1, per_page=per_page if shards <= 1 else 1, **broad_config)
+        total_entries = probe.total_entries
+        broad_requests = max(1, math.ceil(total_entries / per_page))
+
+        # the shards refetch what the probe found
+        if shards > 1:
+            broad_requests = 1 + max(shards, broad_requests)
+            probe = None
+
+        strategy = 'broad' if broad_requests <= fan_out_requests else 'fan-out'
+        return QueryPlan(strategy=strategy, configs=unique_configs, broad_config=dict(broad_config, per_page=per_page), total_entries=total_entries, fan_out_requests=fan_out_requests, broad_requests=broad_requests, window=window, probe=probe, filters=self._plan_filters(unique_configs))
+
+    # With a window each query is sharded into bounded ones run concurrently
+    def run_plan(self, plan, max_workers=None):
+        if plan.strategy == 'fan-out':
+            return self.query_time_entries(self.shard_configs(plan.configs, plan.window), max_workers=max_workers)
+
+        if plan.window is None:
+            pages = self.all_pages(self.time_entries, max_workers=max_workers, first_page=plan.probe, **plan.broad_config)
+            candidates = (time_entry for page in pages for time_entry in page.time_entries)
+        else:
+            candidates = self.query_time_entries(self.shard_configs([plan.broad_config], plan.window), max_workers=max_workers)
+
+        return [time_entry for time_entry in candidates if self._matches_plan(plan, time_entry)]
+
+    # whether a time entry of a broad plan matches one of its configs, a set
+    # lookup per set of filter fields rather than a comparison per config
+    def _matches_plan(self, plan, time_entry):
+        if plan.filters is None:
+            plan.filters = self._plan_filters(plan.configs)
+
+        for keys, allowed in plan.filters.items():
+            if tuple(str(getattr(time_entry, self.FILTER_FIELDS[key]).id) for key in keys) in allowed:
+                return True
+        return False
+
+    # The ids configs allow as a set of tuples of id strings, keyed by the
+    # filter fields they're for, usually the same for every config
+    def _plan_filters(self, configs):
+        filters = {}
+        for config in configs:
+            keys = tuple(sorted(key for key in config if key in self.FILTER_FIELDS))
+            filters.setdefault(keys, set()).add(tuple(str(config[key]) for key in keys))
+        return filters
+
+    # The pages of time entries a plan fetches, one query after another
+    def _iter_plan_pages(self, plan):
+        if plan.strategy == 'fan-out':
+            configs = self.shard_configs(plan.configs, plan.window)
+        elif plan.window is None:
+            yield from self._iter_pages(self.time_entries, first_page=plan.probe, **plan.broad_config)
+            return
+        else:
+            configs = self.shard_configs([plan.broad_config], plan.window)
 
+        for config in configs:
+            yield from self._iter_pages(self.time_entries, **config)
 
-    # team is user
-    def detailed_time(self, time_frame='All Time', clients=[None], projects=[None], tasks=[None], team=[None], include_archived_items=False, show='All Hours', group_by='Date', activeProject_only=False):
+    def _detailed_time_configs(self, time_frame, clients, projects, team, from_date=None, to_date=None, filters={}):
         arg_configs = []
-        time_entry_results = DetailedTimeReport([])
+        bounds = dict(self.timeframe(time_frame, from_date, to_date), **filters)
 
         for element in itertools.product(clients, projects, team):
             kwargs = {}
@@ -103,47 +415,102 @@ class Reports(Harvest):
             if element[2] !=None:
                 kwargs['user_id'] = element[2]
 
-            kwargs = dict(self.timeframe(time_frame), **kwargs)
+            kwargs = dict(bounds, **kwargs)
 
             arg_configs.append(kwargs)
 
-        tmp_time_entry_results = []
-        if arg_configs == []:
-            time_entries = self.time_entries()
-            tmp_time_entry_results.extend(time_entries.time_entries)
-            if time_entries.total_pages > 1:
-                for page in range(2, time_entries.total_pages + 1):
-                    time_entries = self.time_entries(page=page)
-                    tmp_time_entry_results.extend(time_entries.time_entries)
-        else:
-            for config in arg_configs:
-                time_entries = self.time_entries(**kwargs)
-                tmp_time_entry_results.extend(time_entries.time_entries)
-                if time_entries.total_pages > 1:
-                    for page in range(2, time_entries.total_pages + 1):
-                        time_entries = self.time_entries(page=page, **kwargs)
-                        tmp_time_entry_results.extend(time_entries.time_entries)
+        return arg_configs or [bounds]
 
-        for time_entry in tmp_time_entry_results:
-            user = None
-            if time_entry.user.id not in self.user_cache.keys():
-                user = self.get_user(time_entry.user.id)
-                self.user_cache[time_entry.user.id] = user
-            else:
-                user = self.user_cache[time_entry.user.id]
+    # The QueryPlan detailed_time would run for the same arguments. Probes
+    # the broad query, so can cost a request.
+    def explain(self, time_frame='All Time', clients=[None], projects=[None], tasks=[None], team=[None], show='All Hours', from_date=None, to_date=None, window=None, **kwargs):
+        filters, billable = self.show(show)
+        return self.plan_time_entries(self._detailed_time_configs(time_frame, clients, projects, team, from_date, to_date, filters), window=window)
+
+    # team is user. from_date and to_date bound the 'Custom' time_frame,
+    # window ('day', 'week' or 'month') shards it into concurrent queries.
+    # The rows aren't grouped, group_by is refused rather than ignored, see
+    # grouped_time.
+    def detailed_time(self, time_frame='All Time', clients=[None], projects=[None], tasks=[None], team=[None], include_archived_items=False, show='All Hours', group_by=None, activeProject_only=False, from_date=None, to_date=None, window=None):
+        self._check_ungrouped(group_by)
+        time_entry_results = DetailedTimeReport([])
 
-            hours = time_entry.hours
-            billable_amount = 0.0
-            cost_amount = 0.0
-            billable_rate = time_entry.billable_rate
-            cost_rate = time_entry.cost_rate
+        filters, billable = self.show(show)
+        plan = self.plan_time_entries(self._detailed_time_configs(time_frame, clients, projects, team, from_date, to_date, filters), window=window)
+        tmp_time_entry_results = self.run_plan(plan)
 
-            if hours is not None:
-                if billable_rate is not None:
-                    billable_amount = billable_rate * hours
-                if cost_rate is not None:
-                    cost_amount = cost_rate * hours
+        if billable is not None:
+            tmp_time_entry_results = [time_entry for time_entry in tmp_time_entry_results if time_entry.billable == billable]
 
-            time_entry_results.detailed_time_entries.append( DetailedTimeEntry(date=time_entry.spent_date, client=time_entry.client.name, project=time_entry.project.name, project_code=time_entry.project.code, task=time_entry.task.name, notes=time_entry.notes, hours=hours, billable=str(time_entry.billable), invoiced='', approved='', first_name=user.first_name, last_name=user.last_name, roles=user.roles, employee='Yes', billable_rate=billable_rate, billable_amount=billable_amount, cost_rate=cost_rate, cost_amount=cost_amount, currency=time_entry.client.currency, external_reference_url=time_entry.external_reference) )
+        users = self.users_by_id({time_entry.user.id for time_entry in tmp_time_entry_results})
+
+        for time_entry in tmp_time_entry_results:
+            time_entry_results.detailed_time_entries.append(self._detailed_time_entry(time_entry, users[time_entry.user.id]))
 
         return time_entry_results
+
+    # detailed_time as a generator of its rows, yielded page by page so a
+    # long history is never held in memory at once. Pages are fetched as
+    # the rows are consumed or, with buffer_size, by a thread at most
+    # buffer_size pages ahead.
+    def iter_detailed_time(self, time_frame='All Time', clients=[None], projects=[None], tasks=[None], team=[None], include_archived_items=False, show='All Hours', group_by=None, activeProject_only=False, from_date=None, to_date=None, window=None, buffer_size=None):
+        self._check_ungrouped(group_by)
+        filters, billable = self.show(show)
+        plan = self.plan_time_entries(self._detailed_time_configs(time_frame, clients, projects, team, from_date, to_date, filters), window=window)
+
+        pages = self._iter_plan_pages(plan)
+        if buffer_size:
+            pages = prefetch(pages, buffer_size)
+
+        # only the ids are kept, to drop entries matching several configs
+        seen = set() if plan.strategy == 'fan-out' and len(plan.configs) > 1 else None
+
+        for page in pages:
+            time_entries = page.time_entries
+            if plan.strategy == 'broad':
+                time_entries = [time_entry for time_entry in time_entries if self._matches_plan(plan, time_entry)]
+            if billable is not None:
+                time_entries = [time_entry for time_entry in time_entries if time_entry.billable == billable]
+            if seen is not None:
+                time_entries = [time_entry for time_entry in time_entries if time_entry.id not in seen]
+                seen.update(time_entry.id for time_entry in time_entries)
+
+            users = self.users_by_id({time_entry.user.id for time_entry in time_entries})
+            for time_entry in time_entries:
+                yield self._detailed_time_entry(time_entry, users[time_entry.user.id])
+
+    def _detailed_time_entry(self, time_entry, user):
+        hours = time_entry.hours
+        billable_amount = 0.0
+        cost_amount = 0.0
+        billable_rate = time_entry.billable_rate
+        cost_rate = time_entry.cost_rate
+
+        if hours is not None:
+            if billable_rate is not None:
+                billable_amount = billable_rate * hours
+            if cost_rate is not None:
+                cost_amount = cost_rate * hours
+
+        return DetailedTimeEntry(date=time_entry.spent_date, client=time_entry.client.name, project=time_entry.project.name, project_code=time_entry.project.code, task=time_entry.task.name, notes=time_entry.notes, hours=hours, billable=str(time_entry.billable), invoiced='', approved='', first_name=user.first_name, last_name=user.last_name, roles=user.roles, employee='Yes', billable_rate=billable_rate, billable_amount=billable_amount, cost_rate=cost_rate, cost_amount=cost_amount, currency=time_entry.client.currency, external_reference_url=time_entry.external_reference)
+
+    def _check_ungrouped(self, group_by):
+        if group_by is not None:
+            raise HarvestError('detailed_time doesn\'t group its rows, use grouped_time(group_by={0!r}).'.format(group_by))
+
+    # detailed_time totalled by group_by, a name or a list of names from
+    # GROUP_BY, with subtotals, see ColumnarTimeReport.group_by. The other
+    # arguments are detailed_time's. Needs numpy.
+    def grouped_time(self, group_by='Date', **kwargs):
+        if isinstance(group_by, str):
+            group_by = [group_by]
+
+        names = []
+        for name in group_by:
+            if name.lower() not in self.GROUP_BY:
+                raise HarvestError('Invalid group by "{0}".'.format(name))
+            names.append(self.GROUP_BY[name.lower()])
+
+        report = ColumnarTimeReport.from_report(self.detailed_time(**kwargs))
+        week_start_day = self._week_start_day() if 'week' in names else 'Monday'
+        return report.group_by(*names, week_start_day=week_start_day)
@@ -0,0 +1,106 @@
+
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+class RetryPolicy(object):
+    """When and how long to wait before retrying a failed request.
+
+    Idempotent methods are retried on any of retry_statuses and on
+    connection errors and timeouts, up to idempotent_retries times.
+
+    Non-idempotent methods (POST, PATCH) are only retried when Harvest
+    cannot have acted on the request: a 429 or 503, or a failure to
+    connect at all, a connect timeout or a connection that was refused or
+    couldn't be opened before anything was sent. They have their own,
+    smaller, budget.
+
+    Waits honour Retry-After, otherwise they back off exponentially from
+    backoff_factor seconds with full jitter, capped at max_backoff."""
+
+    IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+    RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+    NON_IDEMPOTENT_RETRY_STATUSES = frozenset([429, 503])
+
+    def __init__(self, idempotent_retries=5, non_idempotent_retries=2, backoff_factor=0.5, max_backoff=60, retry_statuses=RETRY_STATUSES, random=random.random, sleep=time.sleep):
+        self.idempotent_retries = idempotent_retries
+        self.non_idempotent_retries = non_idempotent_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_statuses = retry_statuses
+        self.random = random
+        self.sleep = sleep
+
+    def is_idempotent(self, method):
+        return method.upper() in self.IDEMPOTENT_METHODS
+
+    # attempt is the number of retries already made
+    def should_retry(self, method, attempt, status=None, exception=None):
+        if self.is_idempotent(method):
+            if attempt >= self.idempotent_retries:
+                return False
+            if exception is not None:
+                return isinstance(exception, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+            return status in self.retry_statuses
+
+        if attempt >= self.non_idempotent_retries:
+            return False
+        if exception is not None:
+            return connect_failed(exception)
+        return status in self.retry_statuses and status in self.NON_IDEMPOTENT_RETRY_STATUSES
+
+    # status would have been retried but for the budget running out
+    def exhausted(self, method, attempt, status):
+        return self.should_retry(method, 0, status=status) and not self.should_retry(method, attempt, status=status)
+
+    def backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return retry_after
+
+        return self.random() * min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+
+# Retry-After is either a number of seconds or an HTTP date
+def retry_after_seconds(response):
+    retry_after = response.headers.get('Retry-After')
+
+    if retry_after is None:
+        return None
+
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+# Whether exception is a failure to open the connection, so nothing of the
+# request was sent. requests raises a plain ConnectionError for a refused
+# connection, wrapping urllib3's NewConnectionError.
+def connect_failed(exception):
+    if isinstance(exception, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(exception, requests.exceptions.ConnectionError) or not exception.args:
+        return False
+
+    reason = getattr(exception.args[0], 'reason', exception.args[0])
+    return isinstance(reason, NewConnectionError)
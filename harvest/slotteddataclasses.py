@@ -0,0 +1,86 @@
+
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+__slots__ versions of the entity and page dataclasses.
+
+Each class has the same name, fields, defaults and methods as its
+counterpart in harvestdataclasses but no per instance __dict__, so a year of
+TimeEntry objects takes a fraction of the memory. Nested fields are typed
+with the slotted classes so a decoded tree is slotted all the way down.
+Instances compare equal to instances of the same slotted class with equal
+fields, as dataclasses do.
+
+Use them with Harvest(..., response_format='slotted').
+"""
+
+import copy
+import typing
+from dataclasses import is_dataclass
+
+from . import harvestdataclasses
+
+_slotted = {}
+
+def slotted(data_class):
+    if data_class in _slotted:
+        return _slotted[data_class]
+
+    bases = tuple(slotted(base) if is_dataclass(base) else base for base in data_class.__bases__)
+    annotations = data_class.__dict__.get('__annotations__', {})
+    own_fields = [name for name in annotations if name in data_class.__dataclass_fields__]
+
+    class_dict = dict(data_class.__dict__)
+    class_dict.pop('__dict__', None)
+    class_dict.pop('__weakref__', None)
+    # defaults live on the class, and would clash with the slots, but are
+    # already baked in to the generated __init__
+    for name in own_fields:
+        class_dict.pop(name, None)
+    class_dict['__slots__'] = tuple(own_fields)
+    class_dict['__module__'] = __name__
+    class_dict['__annotations__'] = {name: _slotted_type(type_) for name, type_ in annotations.items()}
+
+    dataclass_fields = {}
+    for name, data_field in data_class.__dataclass_fields__.items():
+        data_field = copy.copy(data_field)
+        data_field.type = _slotted_type(data_field.type)
+        dataclass_fields[name] = data_field
+    class_dict['__dataclass_fields__'] = dataclass_fields
+
+    slotted_class = type(data_class)(data_class.__name__, bases, class_dict)
+    _slotted[data_class] = slotted_class
+    _slotted[slotted_class] = slotted_class
+    return slotted_class
+
+def _slotted_type(type_):
+    if isinstance(type_, type) and is_dataclass(type_):
+        return slotted(type_)
+
+    origin = getattr(type_, '__origin__', None)
+    if origin is typing.Union:
+        return typing.Union[tuple(_slotted_type(arg) for arg in type_.__args__)]
+    if origin in (list, typing.List):
+        return typing.List[_slotted_type(type_.__args__[0])]
+
+    return type_
+
+# Authentication classes have their own __init__s calling super() so they stay as they are
+_unslotted = (harvestdataclasses.Auth, harvestdataclasses.OAuth2_ServerSide_Token, harvestdataclasses.OAuth2_ClientSide_Token)
+
+for _name, _data_class in vars(harvestdataclasses).items():
+    if isinstance(_data_class, type) and is_dataclass(_data_class) and not issubclass(_data_class, _unslotted):
+        globals()[_name] = slotted(_data_class)
+
+del _name, _data_class
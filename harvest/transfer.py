@@ -0,0 +1,65 @@
+
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import threading
+from collections import namedtuple
+
+# compressed_bytes is what came over the wire, uncompressed_bytes the body
+# after Content-Encoding was undone
+Transfer = namedtuple('Transfer', ['method', 'url', 'status', 'content_encoding', 'compressed_bytes', 'uncompressed_bytes'])
+
+class TransferStats(object):
+    """Counts the bytes received by a client, before and after decompression.
+
+    last is the Transfer of the latest response received by the calling
+    thread, the totals cover every response including retried ones."""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.reset()
+
+    def record(self, resp):
+        # tell() is how far into the raw, still compressed, stream urllib3 read
+        try:
+            compressed_bytes = resp.raw.tell()
+        except Exception:
+            compressed_bytes = len(resp.content)
+
+        transfer = Transfer(resp.request.method, resp.url, resp.status_code, resp.headers.get('Content-Encoding'), compressed_bytes, len(resp.content))
+        self.__local.last = transfer
+
+        with self.__lock:
+            self.requests += 1
+            self.compressed_bytes += transfer.compressed_bytes
+            self.uncompressed_bytes += transfer.uncompressed_bytes
+
+        return transfer
+
+    @property
+    def last(self):
+        return getattr(self.__local, 'last', None)
+
+    @property
+    def ratio(self):
+        """uncompressed_bytes / compressed_bytes, how much compression saved"""
+        if not self.compressed_bytes:
+            return None
+        return self.uncompressed_bytes / self.compressed_bytes
+
+    def reset(self):
+        with self.__lock:
+            self.requests = 0
+            self.compressed_bytes = 0
+            self.uncompressed_bytes = 0
@@ -46,5 +46,6 @@ setup(
     packages=find_packages(exclude=['ez_setup', 'examples', 'tests']),
     include_package_data=True,
     zip_safe=True,
-    install_requires=read("requirements.txt").split("\n")
+    install_requires=read("requirements.txt").split("\n"),
+    extras_require={'numpy': ['numpy']}
 )
@@ -1,11 +1,21 @@
 
+from .asyncharvest import *
+from .cache import *
 from .clients import *
+from .columnar import *
 from .company import *
+from .decoders import *
 from .estimates import *
 from .expenses import *
+from .export import *
 from .invoices import *
+from .pagination import *
 from .projects import *
+from .ratelimit import *
+from .reports import *
+from .retry import *
 from .roles import *
+from .session import *
 from .tasks import *
 from .timesheets import *
 from .users import *
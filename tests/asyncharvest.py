@@ -0,0 +1,83 @@
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, sys
+import asyncio
+import unittest
+import httpretty
+import warnings
+from dacite import from_dict
+import json
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+import harvest
+from harvest.harvestdataclasses import *
+from harvest.asyncharvest import AsyncHarvest
+
+class TestAsyncHarvest(unittest.TestCase):
+
+    def setUp(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        self.harvest = AsyncHarvest('https://api.harvestapp.com/api/v2', personal_access_token, max_workers=4)
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+
+    def teardown(self):
+        httpretty.reset()
+        httpretty.disable()
+
+    def test_gather(self):
+        company_dict = {"name": "API Examples", "is_active": True}
+        role_dict = {"id": 617630, "name": "Sales", "user_ids": [1782959], "created_at": "2017-06-26T22:34:41Z", "updated_at": "2017-06-26T22:34:52Z"}
+
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/company", body=json.dumps(company_dict), status=200)
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/roles/617630", body=json.dumps(role_dict), status=200)
+
+        async def gather():
+            async with self.harvest as client:
+                return await asyncio.gather(client.company(), client.get_role(role_id=617630))
+
+        requested_company, requested_role = asyncio.run(gather())
+
+        self.assertEqual(requested_company, from_dict(data_class=Company, data=company_dict))
+        self.assertEqual(requested_role, from_dict(data_class=Role, data=role_dict))
+
+        httpretty.reset()
+
+    def test_with_response_format(self):
+        company_dict = {"name": "API Examples", "is_active": True}
+
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/company", body=json.dumps(company_dict), status=200)
+
+        async def company():
+            async with self.harvest as client:
+                json_client = client.with_response_format('json')
+                self.assertIsInstance(json_client, AsyncHarvest)
+                self.assertEqual(json_client.harvest.response_format, 'json')
+                self.assertEqual(client.harvest.response_format, 'dataclass')
+                company = await json_client.company()
+
+                # closing the copy leaves the shared pool running
+                async with client.with_response_format('json'):
+                    pass
+                self.assertEqual(await client.company(), from_dict(data_class=Company, data=company_dict))
+                return company
+
+        self.assertEqual(asyncio.run(company()), company_dict)
+
+        httpretty.reset()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, sys
+import unittest
+import tempfile
+import httpretty
+import warnings
+from dacite import from_dict
+import json
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+import harvest
+from harvest.harvestdataclasses import *
+from harvest.cache import CacheEntry, MemoryCache, ReferenceCache, SQLiteCache, TTLCache
+from tests.ratelimit import FakeClock
+
+company_dict = {"base_uri": "https://{ACCOUNT_SUBDOMAIN}.harvestapp.com", "full_domain": "{ACCOUNT_SUBDOMAIN}.harvestapp.com", "name": "API Examples", "is_active": True, "week_start_day": "Monday", "wants_timestamp_timers": False, "time_format": "hours_minutes", "plan_type": "sponsored", "expense_feature": True, "invoice_feature": True, "estimate_feature": True, "approval_required": False, "clock": "12h", "decimal_symbol": ".", "thousands_separator": ",", "color_scheme": "orange"}
+
+task_dict = {"id": 8083800, "name": "Business Development", "billable_by_default": False, "default_hourly_rate": 0.0, "is_default": False, "is_active": True, "created_at": "2017-06-26T22:08:25Z", "updated_at": "2017-06-26T22:08:25Z"}
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+
+    def teardown(self):
+        httpretty.reset()
+        httpretty.disable()
+
+    # answers 304 when the request carries a matching validator
+    def register_company(self, response_headers_sent):
+        self.conditional_requests = []
+
+        def callback(request, uri, response_headers):
+            validators = (request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since'))
+            self.conditional_requests.append(validators)
+            response_headers.update(response_headers_sent)
+            if validators != (None, None) and validators == (response_headers_sent.get('ETag'), response_headers_sent.get('Last-Modified')):
+                return [304, response_headers, '']
+            return [200, response_headers, json.dumps(company_dict)]
+
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/company", body=callback)
+
+    def client(self, cache, **kwargs):
+        return harvest.Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), cache=cache, **kwargs)
+
+    def test_etag(self):
+        self.register_company({'ETag': '"abc"'})
+        client = self.client(MemoryCache())
+
+        company = from_dict(data_class=Company, data=company_dict)
+        self.assertEqual(client.company(), company)
+        self.assertEqual(client.company(), company)
+        self.assertEqual(self.conditional_requests, [(None, None), ('"abc"', None)])
+
+        self.assertEqual(client.with_response_format('json').company(), company_dict)
+        self.assertEqual(client.with_response_format('bytes')._get('/company'), json.dumps(company_dict).encode())
+
+        httpretty.reset()
+
+    def test_last_modified(self):
+        self.register_company({'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        client = self.client(MemoryCache(), response_format='json')
+
+        first = client.company()
+        first['name'] = 'Changed'
+        self.assertEqual(client.company(), company_dict)
+        self.assertEqual(self.conditional_requests, [(None, None), (None, 'Wed, 21 Oct 2015 07:28:00 GMT')])
+
+        httpretty.reset()
+
+    def test_not_cached(self):
+        self.register_company({})
+        cache = MemoryCache()
+        client = self.client(cache)
+
+        client.company()
+        client.company()
+        self.assertEqual(self.conditional_requests, [(None, None), (None, None)])
+        self.assertEqual(len(cache), 0)
+
+        httpretty.reset()
+
+    def test_evicted_without_validators(self):
+        changed_dict = dict(company_dict, name="Changed")
+        self.conditional_requests = []
+
+        # the company changes, then is served without validators, yet the
+        # server would still answer the first ETag with a 304
+        def callback(request, uri, response_headers):
+            if_none_match = request.headers.get('If-None-Match')
+            self.conditional_requests.append(if_none_match)
+            if len(self.conditional_requests) == 1:
+                response_headers['ETag'] = '"abc"'
+                return [200, response_headers, json.dumps(company_dict)]
+            if len(self.conditional_requests) > 2 and if_none_match == '"abc"':
+                return [304, response_headers, '']
+            return [200, response_headers, json.dumps(changed_dict)]
+
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/company", body=callback)
+        cache = MemoryCache()
+        client = self.client(cache, response_format='json')
+
+        self.assertEqual(client.company(), company_dict)
+        self.assertEqual(client.company(), changed_dict)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(client.company(), changed_dict)
+        self.assertEqual(self.conditional_requests, [None, '"abc"', None])
+
+        httpretty.reset()
+
+    def test_memory_cache_lru(self):
+        cache = MemoryCache(max_entries=2)
+        cache.set('a', CacheEntry('"a"', None, b'a'))
+        cache.set('b', CacheEntry('"b"', None, b'b'))
+        cache.get('a')
+        cache.set('c', CacheEntry('"c"', None, b'c'))
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a').body, b'a')
+        self.assertEqual(cache.get('c').body, b'c')
+
+    def test_sqlite_cache(self):
+        self.register_company({'ETag': '"abc"'})
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.sqlite')
+
+            # a second run, with a new client and cache, revalidates
+            company = from_dict(data_class=Company, data=company_dict)
+            self.assertEqual(self.client(SQLiteCache(path)).company(), company)
+            self.assertEqual(self.client(SQLiteCache(path)).company(), company)
+            self.assertEqual(self.conditional_requests, [(None, None), ('"abc"', None)])
+
+            cache = SQLiteCache(path)
+            cache.clear()
+            self.client(cache).company()
+            self.assertEqual(self.conditional_requests[-1], (None, None))
+
+        httpretty.reset()
+
+class TestReferenceCache(unittest.TestCase):
+
+    def setUp(self):
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+
+        self.requests = []
+
+        def callback(request, uri, response_headers):
+            self.requests.append(request.method)
+            return [200, response_headers, json.dumps(task_dict)]
+
+        for method in (httpretty.GET, httpretty.PATCH, httpretty.DELETE):
+            httpretty.register_uri(method, "https://api.harvestapp.com/api/v2/tasks/8083800", body=callback)
+
+        self.clock = FakeClock()
+        self.cache = ReferenceCache(ttls={'task': 60}, clock=self.clock.clock)
+        self.harvest = harvest.Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), reference_cache=self.cache)
+
+    def teardown(self):
+        httpretty.reset()
+        httpretty.disable()
+
+    def test_cached(self):
+        task = from_dict(data_class=Task, data=task_dict)
+
+        self.assertEqual(self.harvest.get_task(8083800), task)
+        self.assertEqual(self.harvest.get_task(8083800), task)
+        self.assertEqual(self.harvest.get_task('8083800'), task)
+        self.assertEqual(self.requests, ['GET'])
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+        # each response format is cached separately
+        self.assertEqual(self.harvest.with_response_format('json').get_task(8083800), task_dict)
+        self.assertEqual(self.requests, ['GET', 'GET'])
+
+        self.clock.now = 61
+        self.harvest.get_task(8083800)
+        self.assertEqual(self.requests, ['GET', 'GET', 'GET'])
+
+        self.assertEqual(self.cache.stats()['task'], {'hits': 2, 'misses': 3, 'evictions': 0, 'entries': 2})
+
+        httpretty.reset()
+
+    def test_json_copies(self):
+        client = self.harvest.with_response_format('json')
+
+        # one caller changing its task doesn't change the next one's
+        client.get_task(8083800)['name'] = "Changed"
+        self.assertEqual(client.get_task(8083800), task_dict)
+        self.assertEqual(self.requests, ['GET'])
+
+        httpretty.reset()
+
+    def test_invalidation(self):
+        self.harvest.get_task(8083800)
+        self.harvest.with_response_format('json').get_task(8083800)
+
+        self.harvest.update_task(8083800, name="Business Development")
+        self.assertEqual(len(self.cache.caches['task']), 0)
+        self.harvest.get_task(8083800)
+
+        self.harvest.delete_task(8083800)
+        self.harvest.get_task(8083800)
+        self.assertEqual(self.requests, ['GET', 'GET', 'PATCH', 'GET', 'DELETE', 'GET'])
+
+        httpretty.reset()
+
+    def test_ttl_cache(self):
+        clock = FakeClock()
+        cache = TTLCache(10, max_entries=2, clock=clock.clock)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.evictions, 1)
+
+        clock.now = 10
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, sys
+import unittest
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+import harvest
+from harvest.harvestdataclasses import *
+from harvest.columnar import ColumnarTimeReport, GroupTotal, numpy
+
+def detailed_time_entry(date, client, project, task, first_name, hours, billable_rate, cost_rate, billable='True'):
+    billable_amount = 0.0 if billable_rate is None else billable_rate * hours
+    return DetailedTimeEntry(date=date, client=client, project=project, project_code='', task=task, notes=None, hours=hours, billable=billable, invoiced='', approved='', first_name=first_name, last_name='Allen', roles=[], employee='Yes', billable_rate=billable_rate, billable_amount=billable_amount, cost_rate=cost_rate, cost_amount=cost_rate * hours, currency='USD', external_reference_url=None)
+
+detailed_time_report = DetailedTimeReport([
+        detailed_time_entry('2017-03-01', '123 Industries', 'Online Store - Phase 1', 'Programming', 'Kim', 1.0, 100.0, 50.0),
+        detailed_time_entry('2017-03-02', 'ABC Corp', 'Marketing Website', 'Graphic Design', 'Kim', 2.0, 100.0, 50.0),
+        detailed_time_entry('2017-03-02', '123 Industries', 'Online Store - Phase 1', 'Programming', 'Bob', 3.0, None, 60.0, billable='False'),
+    ])
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestColumnar(unittest.TestCase):
+
+    def test_from_report(self):
+        report = ColumnarTimeReport.from_report(detailed_time_report)
+
+        self.assertEqual(len(report), 3)
+        self.assertEqual(report.numeric['hours'].tolist(), [1.0, 2.0, 3.0])
+        self.assertEqual(report.categories['client'], ('123 Industries', 'ABC Corp'))
+        self.assertEqual(report.codes['client'].tolist(), [0, 1, 0])
+        self.assertEqual(report.categories['user'], ('Kim Allen', 'Bob Allen'))
+        self.assertEqual(report.labels('task').tolist(), ['Programming', 'Graphic Design', 'Programming'])
+        self.assertEqual(str(report.dates[1]), '2017-03-02')
+        self.assertEqual(report.billable.tolist(), [True, True, False])
+
+        # missing rates are NaN and left out of totals
+        self.assertEqual(report.totals(), {'hours': 6.0, 'billable_rate': 200.0, 'billable_amount': 300.0, 'cost_rate': 160.0, 'cost_amount': 330.0})
+
+    def test_filter(self):
+        report = ColumnarTimeReport.from_report(detailed_time_report)
+
+        industries = report[report.where(client='123 Industries')]
+        self.assertEqual(len(industries), 2)
+        self.assertEqual(industries.total('hours'), 4.0)
+        self.assertEqual(industries.categories, report.categories)
+
+        self.assertEqual(report[report.where(client='123 Industries') & report.billable].total('hours'), 1.0)
+        self.assertEqual(report[report.where(user=['Kim Allen', 'Bob Allen'], task='Graphic Design')].total('cost_amount'), 100.0)
+        self.assertEqual(len(report[report.where(client='Nobody')]), 0)
+
+    def test_group_by(self):
+        report = ColumnarTimeReport.from_report(detailed_time_report)
+
+        self.assertEqual(report.group_by('date', 'user'), [
+                GroupTotal(('2017-03-01', 'Kim Allen'), 1.0, 100.0, 50.0, 1),
+                GroupTotal(('2017-03-01',), 1.0, 100.0, 50.0, 1),
+                GroupTotal(('2017-03-02', 'Bob Allen'), 3.0, 0.0, 180.0, 1),
+                GroupTotal(('2017-03-02', 'Kim Allen'), 2.0, 200.0, 100.0, 1),
+                GroupTotal(('2017-03-02',), 5.0, 200.0, 280.0, 2),
+                GroupTotal((), 6.0, 300.0, 330.0, 3),
+            ])
+
+        self.assertEqual(report.group_by('client'), [
+                GroupTotal(('123 Industries',), 4.0, 100.0, 230.0, 2),
+                GroupTotal(('ABC Corp',), 2.0, 200.0, 100.0, 1),
+                GroupTotal((), 6.0, 300.0, 330.0, 3),
+            ])
+
+        self.assertEqual(report.group_by(), [GroupTotal((), 6.0, 300.0, 330.0, 3)])
+        self.assertEqual(report.group_by('month')[0], GroupTotal(('2017-03',), 6.0, 300.0, 330.0, 3))
+
+        # 2017-03-01 is a Wednesday
+        self.assertEqual([total.keys for total in report.group_by('week')], [('2017-02-27',), ()])
+        self.assertEqual([total.keys for total in report.group_by('week', week_start_day='Thursday')], [('2017-02-23',), ('2017-03-02',), ()])
+
+        with self.assertRaises(harvest.HarvestError):
+            report.group_by('currency')
+
+    def test_empty(self):
+        report = ColumnarTimeReport.from_report(DetailedTimeReport([]))
+
+        self.assertEqual(len(report), 0)
+        self.assertEqual(report.total('hours'), 0.0)
+        self.assertEqual(report.group_by('client'), [GroupTotal((), 0.0, 0.0, 0.0, 0)])
+
+if __name__ == '__main__':
+    unittest.main()
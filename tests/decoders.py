@@ -0,0 +1,256 @@
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, sys
+import unittest
+import httpretty
+import warnings
+from dacite import from_dict
+import json
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+import harvest
+from harvest.harvestdataclasses import *
+from dataclasses import asdict
+import dacite
+from harvest import decoders, slotteddataclasses
+
+time_entry_dict = {
+        "id":636708723,
+        "spent_date":"2017-03-01",
+        "user":{
+                "id":1782959,
+                "name":"Kim Allen"
+            },
+        "client":{
+                "id":5735776,
+                "name":"123 Industries"
+            },
+        "project":{
+                "id":14308069,
+                "name":"Online Store - Phase 1"
+            },
+        "task":{
+                "id":8083366,
+                "name":"Programming"
+            },
+        "user_assignment":{
+                "id":125068554,
+                "is_project_manager":True,
+                "is_active":True,
+                "budget":None,
+                "created_at":"2017-06-26T22:32:52Z",
+                "updated_at":"2017-06-26T22:32:52Z",
+                "hourly_rate":100.0
+            },
+        "task_assignment":{
+                "id":155505014,
+                "billable":True,
+                "is_active":True,
+                "created_at":"2017-06-26T21:52:18Z",
+                "updated_at":"2017-06-26T21:52:18Z",
+                "hourly_rate":100.0,
+                "budget":None
+            },
+        "hours":1.0,
+        "notes":"Importing products",
+        "created_at":"2017-06-27T15:49:28Z",
+        "updated_at":"2017-06-27T16:47:14Z",
+        "is_locked":True,
+        "locked_reason":"Item Invoiced and Approved and Locked for this Time Period",
+        "is_closed":True,
+        "is_billed":True,
+        "timer_started_at":None,
+        "started_time":"1:00pm",
+        "ended_time":"2:00pm",
+        "is_running":False,
+        "invoice":{
+                "id":13150403,
+                "number":"1001"
+            },
+        "external_reference":None,
+        "billable":True,
+        "budgeted":True,
+        "billable_rate":100.0,
+        "cost_rate":50.0
+    }
+
+time_entries_dict = {
+        "time_entries":[time_entry_dict, dict(time_entry_dict, id=636708724, invoice=None)],
+        "per_page":100,
+        "total_pages":1,
+        "total_entries":2,
+        "next_page":None,
+        "previous_page":None,
+        "page":1,
+        "links":{
+                "first":"https://api.harvestapp.com/v2/time_entries?page=1&per_page=100",
+                "next":None,
+                "previous":None,
+                "last":"https://api.harvestapp.com/v2/time_entries?page=1&per_page=100"
+            }
+    }
+
+invoice_dict = {
+        "id":13150378,
+        "client_key":"9e97f4a65c5b83b1fc02f54e5a41c9dc7d458542",
+        "number":"1000",
+        "purchase_order":"1234",
+        "amount":10000.0,
+        "due_amount":0.0,
+        "tax":5.0,
+        "tax_amount":500.0,
+        "tax2":None,
+        "tax2_amount":0.0,
+        "discount":None,
+        "discount_amount":0.0,
+        "subject":"Online Store - Phase 1",
+        "notes":"Thanks!",
+        "state":"paid",
+        "period_start":"2017-03-01",
+        "period_end":"2017-03-01",
+        "issue_date":"2017-04-01",
+        "due_date":"2017-04-01",
+        "payment_term":"upon receipt",
+        "sent_at":"2017-08-23T22:25:59Z",
+        "paid_at":"2017-08-21T00:00:00Z",
+        "paid_date":"2017-08-21",
+        "closed_at":None,
+        "created_at":"2017-06-27T16:24:30Z",
+        "updated_at":"2017-08-23T22:25:59Z",
+        "currency":"USD",
+        "client":{
+                "id":5735776,
+                "name":"123 Industries"
+            },
+        "estimate":None,
+        "retainer":None,
+        "creator":{
+                "id":1782884,
+                "name":"Bob Powell"
+            },
+        "line_items":[
+                {
+                    "id":53341450,
+                    "kind":"Service",
+                    "description":"50% of Phase 1 of the Online Store",
+                    "quantity":100.0,
+                    "unit_price":100.0,
+                    "amount":10000.0,
+                    "taxed":True,
+                    "taxed2":True,
+                    "project":{
+                        "id":14308069,
+                        "name":"Online Store - Phase 1",
+                        "code":"OS1"
+                    }
+                }
+            ]
+    }
+
+invoice_payment_dict = {
+        "id":10112854,
+        "amount":10700.0,
+        "paid_at":"2017-02-21T00:00:00Z",
+        "paid_date":"2017-02-21",
+        "recorded_by":"Alice Doe",
+        "recorded_by_email":"alice@example.com",
+        "notes":"Paid via check #4321",
+        "transaction_id":None,
+        "created_at":"2017-06-27T16:24:57Z",
+        "updated_at":"2017-06-27T16:24:57Z",
+        "payment_gateway":{
+                "id":1234,
+                "name":"Linkpoint International"
+            }
+    }
+
+class TestDecoders(unittest.TestCase):
+
+    def test_same_as_dacite(self):
+        for data_class, data in [
+                (TimeEntry, time_entry_dict),
+                (TimeEntries, time_entries_dict),
+                (Invoice, invoice_dict),
+                (InvoicePayment, invoice_payment_dict),
+                (Company, {}),
+                (Role, {"id": 1, "name": "Sales", "user_ids": [1, 2]}),
+            ]:
+            self.assertEqual(decoders.from_dict(data_class, data), dacite.from_dict(data_class=data_class, data=data))
+
+    def test_missing_values(self):
+        # missing Optional fields are None and init=False fields are left unset
+        page = decoders.from_dict(TimeEntries, {})
+        self.assertEqual(page.previous_page, None)
+        self.assertEqual(page.page, 1)
+        self.assertFalse(hasattr(page, 'time_entries'))
+
+        with self.assertRaises(dacite.MissingValueError):
+            decoders.from_dict(DetailedTimeReport, {})
+
+    def test_compiled_once(self):
+        self.assertIs(decoders.decoder(TimeEntry), decoders.decoder(TimeEntry))
+
+    def test_lazy(self):
+        time_entries = decoders.from_dict(TimeEntries, time_entries_dict, lazy=True)
+        time_entry = time_entries.time_entries[0]
+
+        self.assertIsInstance(time_entry, TimeEntry)
+        self.assertEqual((time_entry.hours, time_entry.spent_date), (1.0, "2017-03-01"))
+        self.assertNotIn('user', vars(time_entry))
+
+        # decoded on first read, then cached
+        self.assertEqual(time_entry.user.name, "Kim Allen")
+        self.assertIn('user', vars(time_entry))
+        self.assertIs(time_entry.user, time_entry.user)
+        self.assertNotIn('client', vars(time_entry))
+
+        self.assertEqual(asdict(time_entries), asdict(dacite.from_dict(data_class=TimeEntries, data=time_entries_dict)))
+        self.assertEqual(time_entries, decoders.from_dict(TimeEntries, time_entries_dict, lazy=True))
+
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/time_entries/636708723", body=json.dumps(time_entry_dict), status=200)
+
+        client = harvest.Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), response_format='lazy')
+        requested_time_entry = client.get_time_entry(636708723)
+        self.assertNotIn('project', vars(requested_time_entry))
+        self.assertEqual(asdict(requested_time_entry), asdict(dacite.from_dict(data_class=TimeEntry, data=time_entry_dict)))
+
+        httpretty.reset()
+        httpretty.disable()
+
+    def test_slotted(self):
+        time_entries = decoders.from_dict(slotteddataclasses.TimeEntries, time_entries_dict)
+
+        self.assertEqual(time_entries, decoders.from_dict(slotteddataclasses.TimeEntries, time_entries_dict))
+        self.assertEqual(asdict(time_entries), asdict(dacite.from_dict(data_class=TimeEntries, data=time_entries_dict)))
+        self.assertEqual(type(time_entries.time_entries[0].user).__module__, 'harvest.slotteddataclasses')
+        self.assertFalse(hasattr(time_entries, '__dict__'))
+        self.assertFalse(hasattr(time_entries.time_entries[0], '__dict__'))
+        self.assertFalse(hasattr(time_entries.time_entries[0].user_assignment, '__dict__'))
+
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/time_entries/636708723", body=json.dumps(time_entry_dict), status=200)
+
+        client = harvest.Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), response_format='slotted')
+        self.assertEqual(client.get_time_entry(636708723), decoders.from_dict(slotteddataclasses.TimeEntry, time_entry_dict))
+
+        httpretty.reset()
+        httpretty.disable()
+
+if __name__ == '__main__':
+    unittest.main()
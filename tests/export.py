@@ -0,0 +1,164 @@
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, sys
+import unittest
+import httpretty
+import warnings
+import json
+import re
+import csv
+import io
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+import harvest
+from harvest.harvestdataclasses import *
+from harvest.export import export_csv, export_jsonl
+from harvest.reports import Reports
+from tests.decoders import time_entry_dict, invoice_dict
+from tests.reports import page_of, kim_allen_dict, bob_powell_dict
+
+time_entries = [
+        time_entry_dict,
+        dict(time_entry_dict, id=636708724, user={"id": 1782884, "name": "Bob Powell"}),
+        dict(time_entry_dict, id=636708725, billable=False, is_billed=False, invoice=None)
+    ]
+
+invoices = [
+        invoice_dict,
+        dict(invoice_dict, id=13150379, number="1001", line_items=[dict(line_item, id=53341451 + index) for index, line_item in enumerate(invoice_dict["line_items"] * 2)]),
+        dict(invoice_dict, id=13150380, number="1002", line_items=[])
+    ]
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        self.reports = Reports('https://api.harvestapp.com/api/v2', personal_access_token)
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+
+        self.requests = []
+        self.time_entries = time_entries
+
+        # two entries on page 1, the third on page 2
+        def time_entries_callback(request, uri, response_headers):
+            self.requests.append(request.path)
+            number = int(request.querystring['page'][0])
+            page = page_of("time_entries", self.time_entries[2 * number - 2:2 * number], "time_entries")
+            page.update(page=number, total_pages=2, total_entries=len(self.time_entries))
+            if number == 1:
+                page["links"]["next"] = "https://api.harvestapp.com/api/v2/time_entries?page=2&per_page=100"
+            return [200, response_headers, json.dumps(page)]
+
+        def invoices_callback(request, uri, response_headers):
+            return [200, response_headers, json.dumps(page_of("invoices", invoices, "invoices"))]
+
+        def users_callback(request, uri, response_headers):
+            return [200, response_headers, json.dumps(page_of("users", [kim_allen_dict, bob_powell_dict], "users"))]
+
+        httpretty.register_uri(httpretty.GET, re.compile(r"https://api.harvestapp.com/api/v2/time_entries.*"), body=time_entries_callback)
+        httpretty.register_uri(httpretty.GET, re.compile(r"https://api.harvestapp.com/api/v2/invoices.*"), body=invoices_callback)
+        httpretty.register_uri(httpretty.GET, re.compile(r"https://api.harvestapp.com/api/v2/users(\?.*)?$"), body=users_callback)
+
+    def teardown(self):
+        httpretty.reset()
+        httpretty.disable()
+
+    def test_export_csv(self):
+        fh = io.StringIO()
+        self.assertEqual(export_csv(self.reports, 'time_entries', fh), 3)
+
+        rows = list(csv.DictReader(io.StringIO(fh.getvalue())))
+        self.assertEqual([row['id'] for row in rows], ['636708723', '636708724', '636708725'])
+        self.assertEqual([row['user.name'] for row in rows], ['Kim Allen', 'Bob Powell', 'Kim Allen'])
+        self.assertEqual([row['invoice.number'] for row in rows], ['1001', '1001', ''])
+        self.assertEqual((rows[0]['task_assignment.hourly_rate'], rows[0]['external_reference'], rows[2]['billable']), ('100.0', '', 'False'))
+        self.assertEqual(self.requests, ['/api/v2/time_entries?page=1&per_page=100', '/api/v2/time_entries?page=2&per_page=100'])
+
+        fh = io.StringIO()
+        self.assertEqual(export_csv(self.reports, 'time_entries', fh, columns=['id', 'hours', 'client.name'], buffer_size=1), 3)
+        self.assertEqual(fh.getvalue().splitlines(), ['id,hours,client.name', '636708723,1.0,123 Industries', '636708724,1.0,123 Industries', '636708725,1.0,123 Industries'])
+
+        with self.assertRaises(harvest.HarvestError):
+            export_csv(self.reports, 'company', io.StringIO())
+
+        httpretty.reset()
+
+    def test_export_csv_schema_columns(self):
+        # not invoiced yet on page 1, invoiced on page 2
+        self.time_entries = [time_entries[2], dict(time_entries[2], id=636708726), time_entries[0]]
+
+        fh = io.StringIO()
+        self.assertEqual(export_csv(self.reports, 'time_entries', fh), 3)
+
+        rows = list(csv.DictReader(io.StringIO(fh.getvalue())))
+        self.assertEqual([(row['invoice.id'], row['invoice.number']) for row in rows], [('', ''), ('', ''), ('13150403', '1001')])
+        self.assertNotIn('invoice', rows[0])
+        self.assertIn('user_assignment.hourly_rate', rows[0])
+
+        # with nothing to export there's still a header
+        self.time_entries = []
+        fh = io.StringIO()
+        self.assertEqual(export_csv(self.reports, 'time_entries', fh), 0)
+        self.assertIn('invoice.number', next(csv.reader(io.StringIO(fh.getvalue()))))
+
+        httpretty.reset()
+
+    def test_export_csv_invoices(self):
+        fh = io.StringIO()
+        self.assertEqual(export_csv(self.reports, 'invoices', fh), 4)
+
+        # a row per line item, with an invoice without any still listed
+        rows = list(csv.DictReader(io.StringIO(fh.getvalue())))
+        self.assertEqual([(row['number'], row['line_items.id']) for row in rows], [('1000', '53341450'), ('1001', '53341451'), ('1001', '53341452'), ('1002', '')])
+        self.assertEqual((rows[0]['client.name'], rows[0]['line_items.project.code'], rows[0]['line_items.amount']), ('123 Industries', 'OS1', '10000.0'))
+        self.assertNotIn('line_items', rows[0])
+
+        httpretty.reset()
+
+    def test_export_jsonl(self):
+        fh = io.StringIO()
+        self.assertEqual(export_jsonl(self.reports, 'time_entries', fh), 3)
+        self.assertEqual([json.loads(line) for line in fh.getvalue().splitlines()], time_entries)
+
+        fh = io.StringIO()
+        self.assertEqual(export_jsonl(self.reports, 'invoices', fh), 3)
+        self.assertEqual([json.loads(line) for line in fh.getvalue().splitlines()], invoices)
+
+        httpretty.reset()
+
+    def test_export_detailed_time(self):
+        report = self.reports.detailed_time()
+
+        fh = io.StringIO()
+        self.assertEqual(export_csv(self.reports, 'detailed_time', fh), 3)
+        rows = list(csv.DictReader(io.StringIO(fh.getvalue())))
+        self.assertEqual([(row['first_name'], row['client'], row['billable'], row['roles']) for row in rows], [('Kim', '123 Industries', 'True', '["Designer"]'), ('Bob', '123 Industries', 'True', '["Founder", "CEO"]'), ('Kim', '123 Industries', 'False', '["Designer"]')])
+
+        fh = io.StringIO()
+        self.assertEqual(export_jsonl(self.reports, 'detailed_time', fh, show='Billable Hours'), 2)
+        self.assertEqual([json.loads(line)['last_name'] for line in fh.getvalue().splitlines()], ['Allen', 'Powell'])
+        self.assertEqual(json.loads(fh.getvalue().splitlines()[0])['billable_amount'], report.detailed_time_entries[0].billable_amount)
+
+        # only a Reports has detailed_time
+        client = harvest.Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'))
+        with self.assertRaises(harvest.HarvestError):
+            export_csv(client, 'detailed_time', io.StringIO())
+
+        httpretty.reset()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, sys
+import asyncio
+import unittest
+import httpretty
+import warnings
+from dacite import from_dict
+import json
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+import harvest
+from harvest.harvestdataclasses import *
+from harvest.asyncharvest import AsyncHarvest
+def role_page(page, total_pages):
+    url = "https://api.harvestapp.com/api/v2/roles?page={0}&per_page=1"
+    return {
+            "roles":[{"id": page, "name": "Role {0}".format(page), "user_ids": [], "created_at": "2017-06-26T22:34:41Z", "updated_at": "2017-06-26T22:34:52Z"}],
+            "per_page":1,
+            "total_pages":total_pages,
+            "total_entries":total_pages,
+            "next_page":page + 1 if page < total_pages else None,
+            "previous_page":page - 1 if page > 1 else None,
+            "page":page,
+            "links":{
+                    "first":url.format(1),
+                    "next":url.format(page + 1) if page < total_pages else None,
+                    "previous":url.format(page - 1) if page > 1 else None,
+                    "last":url.format(total_pages)
+                }
+        }
+
+class TestPagination(unittest.TestCase):
+
+    def setUp(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        self.harvest = harvest.Harvest('https://api.harvestapp.com/api/v2', personal_access_token)
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+
+    def teardown(self):
+        httpretty.reset()
+        httpretty.disable()
+
+    def register_roles(self, total_pages):
+        self.requested_pages = []
+
+        def callback(request, uri, response_headers):
+            page = int(request.querystring['page'][0])
+            self.requested_pages.append(page)
+            return [200, response_headers, json.dumps(role_page(page, total_pages))]
+
+        httpretty.reset()
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/roles", body=callback)
+
+    def test_all_pages(self):
+        self.register_roles(5)
+
+        pages = self.harvest.all_pages(self.harvest.roles, per_page=1, max_workers=3)
+
+        self.assertEqual(pages, [from_dict(data_class=Roles, data=role_page(page, 5)) for page in range(1, 6)])
+        self.assertEqual([role.id for page in pages for role in harvest.page_items(page)], [1, 2, 3, 4, 5])
+        self.assertEqual(sorted(self.requested_pages), [1, 2, 3, 4, 5])
+
+        httpretty.reset()
+
+    def test_all_pages_single_page(self):
+        self.register_roles(1)
+
+        pages = self.harvest.all_pages(self.harvest.roles, per_page=1)
+
+        self.assertEqual(pages, [from_dict(data_class=Roles, data=role_page(1, 1))])
+        self.assertEqual(self.requested_pages, [1])
+
+        httpretty.reset()
+
+    def test_iter(self):
+        self.register_roles(3)
+
+        roles = self.harvest.iter_roles(per_page=1)
+        self.assertEqual(self.requested_pages, [])
+
+        self.assertEqual(next(roles).id, 1)
+        self.assertEqual(self.requested_pages, [1])
+
+        self.assertEqual([role.id for role in roles], [2, 3])
+        self.assertEqual(self.requested_pages, [1, 2, 3])
+
+        httpretty.reset()
+
+    def test_response_formats(self):
+        self.register_roles(3)
+
+        # per call
+        json_client = self.harvest.with_response_format('json')
+        self.assertEqual(json_client.roles(page=2, per_page=1), role_page(2, 3))
+        self.assertEqual([role['id'] for role in json_client.iter_roles(per_page=1)], [1, 2, 3])
+        self.assertEqual(json_client.all_pages(json_client.roles, per_page=1), [role_page(page, 3) for page in range(1, 4)])
+        self.assertIs(json_client.session, self.harvest.session)
+        self.assertEqual(self.harvest.response_format, 'dataclass')
+
+        # per client
+        bytes_client = harvest.Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), response_format='bytes')
+        self.assertEqual(json.loads(bytes_client.roles(page=2, per_page=1)), role_page(2, 3))
+        self.assertEqual([json.loads(page) for page in bytes_client.all_pages(bytes_client.roles, per_page=1)], [role_page(page, 3) for page in range(1, 4)])
+        self.assertEqual([role['id'] for role in bytes_client.iter_roles(per_page=1)], [1, 2, 3])
+
+        with self.assertRaises(harvest.HarvestError):
+            self.harvest.with_response_format('xml')
+
+        httpretty.reset()
+
+    def test_async_iter(self):
+        self.register_roles(3)
+
+        async def collect():
+            async with AsyncHarvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')) as client:
+                return [role.id async for role in client.iter_roles(per_page=1)]
+
+        self.assertEqual(asyncio.run(collect()), [1, 2, 3])
+
+        httpretty.reset()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, sys
+import unittest
+import tempfile
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+import harvest
+from harvest.harvestdataclasses import *
+from harvest.ratelimit import SlidingWindowRateLimiter, SQLiteRateLimiter
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class TestRateLimit(unittest.TestCase):
+
+    def test_sliding_window(self):
+        fake = FakeClock()
+        limiter = SlidingWindowRateLimiter(3, 15, clock=fake.clock, sleep=fake.sleep)
+
+        # the full budget is available back to back
+        for _ in range(3):
+            limiter.acquire()
+        self.assertEqual(fake.sleeps, [])
+
+        fake.now = 5.0
+        self.assertEqual(limiter.wait_time(), 10.0)
+
+        # waits only until the oldest request leaves the window
+        limiter.acquire()
+        self.assertEqual(fake.sleeps, [10.0])
+        self.assertEqual(fake.now, 15.0)
+
+        self.assertEqual(limiter.wait_time(), 0.0)
+
+    def test_shared_by_token(self):
+        first = harvest.Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'))
+        second = harvest.Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'))
+        other = harvest.Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'ANOTHER_ACCESS_TOKEN'))
+
+        self.assertIs(first.rate_limiter, second.rate_limiter)
+        self.assertIsNot(first.rate_limiter, other.rate_limiter)
+        self.assertEqual(first.rate_limiter.max_requests, 100)
+        self.assertEqual(first.rate_limiter.period, 15)
+
+        limiter = SlidingWindowRateLimiter(1, 1)
+        self.assertIs(harvest.Harvest('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), rate_limiter=limiter).rate_limiter, limiter)
+
+    def test_sqlite(self):
+        fake = FakeClock()
+        fake.now = 1000.0
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'ratelimit.db')
+
+            # two limiters on the same file stand in for two processes
+            first = SQLiteRateLimiter(path, 'ACCOUNT_NUMBER', 'Bearer PERSONAL_ACCESS_TOKEN', max_requests=3, period=15, clock=fake.clock, sleep=fake.sleep)
+            second = SQLiteRateLimiter(path, 'ACCOUNT_NUMBER', 'Bearer PERSONAL_ACCESS_TOKEN', max_requests=3, period=15, clock=fake.clock, sleep=fake.sleep)
+            other = SQLiteRateLimiter(path, 'ACCOUNT_NUMBER', 'Bearer ANOTHER_ACCESS_TOKEN', max_requests=3, period=15, clock=fake.clock, sleep=fake.sleep)
+
+            first.acquire()
+            second.acquire()
+            first.acquire()
+            self.assertEqual(fake.sleeps, [])
+
+            other.acquire()
+            self.assertEqual(fake.sleeps, [])
+
+            fake.now = 1005.0
+            self.assertEqual(second.wait_time(), 10.0)
+
+            second.acquire()
+            self.assertEqual(fake.sleeps, [10.0])
+            self.assertEqual(first.wait_time(), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
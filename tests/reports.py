@@ -0,0 +1,363 @@
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, sys
+import unittest
+import httpretty
+import warnings
+import json
+import re
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+import harvest
+from harvest.harvestdataclasses import *
+from harvest.reports import Reports, date_windows
+from harvest.columnar import GroupTotal, numpy
+from tests.decoders import time_entry_dict
+
+kim_allen_dict = {"id": 1782959, "first_name": "Kim", "last_name": "Allen", "email": "kimallen@example.com", "telephone": "", "timezone": "Eastern Time (US & Canada)", "has_access_to_all_future_projects": True, "is_contractor": False, "is_admin": False, "is_project_manager": True, "can_see_rates": False, "can_create_projects": False, "can_create_invoices": False, "is_active": True, "created_at": "2017-06-26T22:15:45Z", "updated_at": "2017-06-26T22:32:52Z", "weekly_capacity": 126000, "default_hourly_rate": 100.0, "cost_rate": 50.0, "roles": ["Designer"], "avatar_url": "https://cache.harvestapp.com/assets/profile_images/cornell_clock_tower.png?1498515345"}
+
+bob_powell_dict = dict(kim_allen_dict, id=1782884, first_name="Bob", last_name="Powell", email="bobpowell@example.com", roles=["Founder", "CEO"])
+
+jane_doe_dict = dict(kim_allen_dict, id=1782974, first_name="Jane", last_name="Doe", email="janedoe@example.com", roles=["Developer"])
+
+def page_of(name, items, path):
+    return {name: items, "per_page": 100, "total_pages": 1, "total_entries": len(items), "next_page": None, "previous_page": None, "page": 1, "links": {"first": "https://api.harvestapp.com/api/v2/{0}?page=1&per_page=100".format(path), "next": None, "previous": None, "last": "https://api.harvestapp.com/api/v2/{0}?page=1&per_page=100".format(path)}}
+
+time_entries = [
+        time_entry_dict,
+        dict(time_entry_dict, id=636708724, user={"id": 1782884, "name": "Bob Powell"}),
+        dict(time_entry_dict, id=636708725, user={"id": 1782974, "name": "Jane Doe"}),
+        dict(time_entry_dict, id=636708726, billable=False, is_billed=False, invoice=None)
+    ]
+
+class TestReports(unittest.TestCase):
+
+    def setUp(self):
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        self.reports = Reports('https://api.harvestapp.com/api/v2', personal_access_token)
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+
+        self.requests = []
+        self.total_entries = None
+
+        # with paged set, one entry a page linked by links.next
+        self.paged = False
+
+        # the most requests for time entries in flight at once
+        self.in_flight = 0
+        self.most_in_flight = 0
+        in_flight_lock = threading.Lock()
+
+        def time_entries_callback(request, uri, response_headers):
+            with in_flight_lock:
+                self.requests.append(request.path)
+                self.in_flight += 1
+                self.most_in_flight = max(self.most_in_flight, self.in_flight)
+            time.sleep(0.01)
+            with in_flight_lock:
+                self.in_flight -= 1
+            page = page_of("time_entries", time_entries, "time_entries")
+            if self.total_entries is not None:
+                page["total_entries"] = self.total_entries
+            if self.paged:
+                number = int(request.querystring['page'][0])
+                page.update(time_entries=time_entries[number - 1:number], page=number, total_pages=len(time_entries))
+                if number < len(time_entries):
+                    page["links"]["next"] = "https://api.harvestapp.com/api/v2/time_entries?page={0}&per_page=100".format(number + 1)
+            return [200, response_headers, json.dumps(page)]
+
+        # Jane Doe left, so only turns up from get_user
+        def users_callback(request, uri, response_headers):
+            self.requests.append(request.path)
+            return [200, response_headers, json.dumps(page_of("users", [kim_allen_dict, bob_powell_dict], "users"))]
+
+        def user_callback(request, uri, response_headers):
+            self.requests.append(request.path)
+            return [200, response_headers, json.dumps(jane_doe_dict)]
+
+        httpretty.register_uri(httpretty.GET, re.compile(r"https://api.harvestapp.com/api/v2/time_entries.*"), body=time_entries_callback)
+        httpretty.register_uri(httpretty.GET, re.compile(r"https://api.harvestapp.com/api/v2/users(\?.*)?$"), body=users_callback)
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/users/1782974", body=user_callback)
+
+    def teardown(self):
+        httpretty.reset()
+        httpretty.disable()
+
+    def test_detailed_time_users(self):
+        report = self.reports.detailed_time()
+
+        self.assertEqual([(entry.first_name, entry.last_name, entry.roles) for entry in report.detailed_time_entries], [("Kim", "Allen", ["Designer"]), ("Bob", "Powell", ["Founder", "CEO"]), ("Jane", "Doe", ["Developer"]), ("Kim", "Allen", ["Designer"])])
+
+        # one sweep of the user directory, get_user only for who it missed
+        self.assertEqual([path.split('?')[0] for path in self.requests], ['/api/v2/time_entries', '/api/v2/users', '/api/v2/users/1782974'])
+
+        # and the users are kept for the next report
+        self.requests.clear()
+        self.reports.detailed_time()
+        self.assertEqual([path.split('?')[0] for path in self.requests], ['/api/v2/time_entries'])
+
+        httpretty.reset()
+
+    def test_query_time_entries(self):
+        time_entries = self.reports.query_time_entries([{'client_id': 5735776, 'user_id': 1782959}, {'client_id': 5735776, 'user_id': 1782884}, {'client_id': 5735776, 'user_id': 1782959}])
+
+        # three configs, two of them the same, each returning all four entries
+        queries = sorted(path for path in self.requests if path.startswith('/api/v2/time_entries'))
+        self.assertEqual(queries, ['/api/v2/time_entries?page=1&per_page=100&user_id=1782884&client_id=5735776', '/api/v2/time_entries?page=1&per_page=100&user_id=1782959&client_id=5735776'])
+        self.assertEqual([time_entry.id for time_entry in time_entries], [636708723, 636708724, 636708725, 636708726])
+
+        httpretty.reset()
+
+    def test_query_time_entries_workers(self):
+        self.paged = True
+
+        # three queries of four pages each share the two workers
+        time_entries = self.reports.query_time_entries([{'user_id': 1782959}, {'user_id': 1782884}, {'user_id': 1782974}], max_workers=2)
+        self.assertEqual([time_entry.id for time_entry in time_entries], [636708723, 636708724, 636708725, 636708726])
+        self.assertEqual(len(self.requests), 12)
+        self.assertEqual(self.most_in_flight, 2)
+
+        httpretty.reset()
+
+    def test_plan_broad(self):
+        plan = self.reports.explain(team=[1782959, 1782884])
+
+        self.assertEqual((plan.strategy, plan.total_entries, plan.broad_requests, plan.fan_out_requests), ('broad', 4, 1, 2))
+        self.assertEqual(self.requests, ['/api/v2/time_entries?page=1&per_page=2000'])
+        self.assertEqual(plan.filters, {('user_id',): {('1782959',), ('1782884',)}})
+
+        # the probe is the first page of the broad query, entries are filtered locally
+        self.requests.clear()
+        report = self.reports.detailed_time(team=[1782959, 1782884])
+        self.assertEqual([path.split('?')[0] for path in self.requests], ['/api/v2/time_entries', '/api/v2/users'])
+        self.assertEqual([(entry.first_name, entry.last_name) for entry in report.detailed_time_entries], [("Kim", "Allen"), ("Bob", "Powell"), ("Kim", "Allen")])
+
+        httpretty.reset()
+
+    def test_plan_fan_out(self):
+        self.total_entries = 10000
+
+        plan = self.reports.explain(team=[1782959, 1782884])
+        self.assertEqual((plan.strategy, plan.total_entries, plan.broad_requests, plan.fan_out_requests), ('fan-out', 10000, 5, 2))
+
+        # nothing to choose between, no probe
+        plan = self.reports.explain(team=[1782959])
+        self.assertEqual((plan.strategy, plan.total_entries), ('fan-out', None))
+        self.assertEqual(len(self.requests), 1)
+
+        httpretty.reset()
+
+    def test_timeframe(self):
+        self.reports.week_start_day = 'Monday'
+        today = date(2020, 5, 20)
+
+        expected = {
+                'This Week': ('2020-05-18', '2020-05-20'),
+                'Last Week': ('2020-05-11', '2020-05-17'),
+                'This Semimonth': ('2020-05-16', '2020-05-20'),
+                'Last Semimonth': ('2020-05-01', '2020-05-15'),
+                'This Month': ('2020-05-01', '2020-05-20'),
+                'Last Month': ('2020-04-01', '2020-04-30'),
+                'This Quarter': ('2020-04-01', '2020-05-20'),
+                'Last Quarter': ('2020-01-01', '2020-03-31'),
+                'This Year': ('2020-01-01', '2020-05-20'),
+                'Last Year': ('2019-01-01', '2019-12-31'),
+            }
+        for timeframe, (from_date, to_date) in expected.items():
+            self.assertEqual(self.reports.timeframe(timeframe, today=today), {'from_date': from_date, 'to_date': to_date}, timeframe)
+
+        # the current time frame ends today, the last ones run to their end
+        self.assertEqual(self.reports.timeframe('This Year', today=date(2020, 12, 31)), {'from_date': '2020-01-01', 'to_date': '2020-12-31'})
+        self.assertEqual(self.reports.timeframe('Last Semimonth', today=date(2020, 5, 16)), {'from_date': '2020-05-01', 'to_date': '2020-05-15'})
+        self.assertEqual(self.reports.timeframe('Last Semimonth', today=date(2020, 5, 31)), {'from_date': '2020-05-01', 'to_date': '2020-05-15'})
+        self.assertEqual(self.reports.timeframe('Last Semimonth', today=date(2020, 3, 10)), {'from_date': '2020-02-16', 'to_date': '2020-02-29'})
+        self.assertEqual(self.reports.timeframe('Last Month', today=date(2020, 1, 10)), {'from_date': '2019-12-01', 'to_date': '2019-12-31'})
+        self.assertEqual(self.reports.timeframe('Last Quarter', today=date(2020, 2, 10)), {'from_date': '2019-10-01', 'to_date': '2019-12-31'})
+        self.assertEqual(self.reports.timeframe('All Time', today=today), {})
+        self.assertEqual(self.reports.timeframe('Custom', from_date=date(2020, 1, 1), to_date='2020-03-31'), {'from_date': '2020-01-01', 'to_date': '2020-03-31'})
+        self.assertEqual(self.reports.timeframe('Custom', from_date='2020-01-01'), {'from_date': '2020-01-01'})
+
+        self.reports.week_start_day = 'Sunday'
+        self.assertEqual(self.reports.timeframe('This Week', today=today), {'from_date': '2020-05-17', 'to_date': '2020-05-20'})
+
+        with self.assertRaises(harvest.HarvestError):
+            self.reports.timeframe('Next Week')
+
+        httpretty.reset()
+
+    def test_week_start_day(self):
+        company_dict = {"name": "API Examples", "is_active": True, "week_start_day": "Saturday"}
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/company", body=json.dumps(company_dict), status=200)
+
+        self.assertEqual(self.reports.timeframe('This Week', today=date(2020, 5, 20)), {'from_date': '2020-05-16', 'to_date': '2020-05-20'})
+        self.assertEqual(self.reports.week_start_day, 'Saturday')
+
+        httpretty.reset()
+
+    def test_date_windows(self):
+        self.assertEqual(date_windows('2020-01-30', '2020-03-02', 'month'), [('2020-01-30', '2020-01-31'), ('2020-02-01', '2020-02-29'), ('2020-03-01', '2020-03-02')])
+        self.assertEqual(date_windows('2020-01-01', '2020-01-10', 'week'), [('2020-01-01', '2020-01-07'), ('2020-01-08', '2020-01-10')])
+        self.assertEqual(date_windows(date(2020, 1, 1), date(2020, 1, 2), 'day'), [('2020-01-01', '2020-01-01'), ('2020-01-02', '2020-01-02')])
+
+        httpretty.reset()
+
+    def test_sharded(self):
+        report = self.reports.detailed_time('Custom', from_date='2020-01-01', to_date='2020-12-31', window='month')
+
+        queries = sorted(path for path in self.requests if path.startswith('/api/v2/time_entries'))
+        self.assertEqual(len(queries), 12)
+        self.assertEqual(queries[0], '/api/v2/time_entries?page=1&per_page=100&from=2020-01-01&to=2020-01-31')
+        self.assertEqual(queries[-1], '/api/v2/time_entries?page=1&per_page=100&from=2020-12-01&to=2020-12-31')
+        self.assertEqual(len(report.detailed_time_entries), 4)
+
+        # a broad plan is sharded too, the probe of the whole range on top of the shards
+        plan = self.reports.explain('Custom', team=[1782959, 1782884], from_date='2020-01-01', to_date='2020-03-31', window='month')
+        self.assertEqual((plan.strategy, plan.fan_out_requests, plan.broad_requests), ('broad', 6, 4))
+
+        self.requests.clear()
+        report = self.reports.detailed_time('Custom', team=[1782959, 1782884], from_date='2020-01-01', to_date='2020-03-31', window='month')
+        queries = sorted(path for path in self.requests if path.startswith('/api/v2/time_entries'))
+        self.assertEqual(queries, ['/api/v2/time_entries?page=1&per_page=1&from=2020-01-01&to=2020-03-31', '/api/v2/time_entries?page=1&per_page=2000&from=2020-01-01&to=2020-01-31', '/api/v2/time_entries?page=1&per_page=2000&from=2020-02-01&to=2020-02-29', '/api/v2/time_entries?page=1&per_page=2000&from=2020-03-01&to=2020-03-31'])
+        self.assertEqual(len(report.detailed_time_entries), 3)
+
+        httpretty.reset()
+
+    def test_show(self):
+        self.assertEqual(self.reports.show('All Hours'), ({}, None))
+        self.assertEqual(self.reports.show('Invoiced Hours'), ({'is_billed': 'true'}, None))
+
+        with self.assertRaises(harvest.HarvestError):
+            self.reports.show('Overtime')
+
+        # the fixture ignores is_billed, so every entry comes back
+        report = self.reports.detailed_time(show='Uninvoiced Billable Hours')
+        self.assertEqual(self.requests[0], '/api/v2/time_entries?page=1&per_page=100&is_billed=false')
+        self.assertEqual(len(report.detailed_time_entries), 3)
+        self.assertTrue(all(entry.billable == 'True' for entry in report.detailed_time_entries))
+
+        self.requests.clear()
+        report = self.reports.detailed_time(show='Non-Billable Hours')
+        self.assertEqual(self.requests[0], '/api/v2/time_entries?page=1&per_page=100')
+        self.assertEqual([entry.billable for entry in report.detailed_time_entries], ['False'])
+
+        self.assertEqual(self.reports.explain(team=[1782959, 1782884], show='Uninvoiced Hours').broad_config, {'is_billed': 'false', 'per_page': 2000})
+
+        httpretty.reset()
+
+    def test_detailed_time_group_by(self):
+        # the rows aren't grouped, so a grouping isn't silently ignored
+        with self.assertRaises(harvest.HarvestError):
+            self.reports.detailed_time(group_by='Client')
+        with self.assertRaises(harvest.HarvestError):
+            list(self.reports.iter_detailed_time(group_by='Client'))
+        self.assertEqual(self.requests, [])
+
+        httpretty.reset()
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_grouped_time(self):
+        totals = self.reports.grouped_time(group_by=['Client', 'Person'], show='Billable Hours')
+
+        self.assertEqual(totals, [
+                GroupTotal(('123 Industries', 'Bob Powell'), 1.0, 100.0, 50.0, 1),
+                GroupTotal(('123 Industries', 'Jane Doe'), 1.0, 100.0, 50.0, 1),
+                GroupTotal(('123 Industries', 'Kim Allen'), 1.0, 100.0, 50.0, 1),
+                GroupTotal(('123 Industries',), 3.0, 300.0, 150.0, 3),
+                GroupTotal((), 3.0, 300.0, 150.0, 3),
+            ])
+
+        with self.assertRaises(harvest.HarvestError):
+            self.reports.grouped_time(group_by='Currency')
+
+        httpretty.reset()
+
+    def test_iter_detailed_time(self):
+        report = self.reports.detailed_time(team=[1782959, 1782884])
+        self.assertEqual(list(self.reports.iter_detailed_time(team=[1782959, 1782884])), report.detailed_time_entries)
+
+        # fanned out, every query returns all four entries which are kept once
+        self.total_entries = 10000
+        report = self.reports.detailed_time(team=[1782959, 1782884])
+        self.assertEqual(len(report.detailed_time_entries), 4)
+        self.assertEqual(list(self.reports.iter_detailed_time(team=[1782959, 1782884], buffer_size=1)), report.detailed_time_entries)
+
+        httpretty.reset()
+
+    def test_iter_detailed_time_paged(self):
+        self.paged = True
+
+        # pages are only fetched as the rows are consumed
+        rows = self.reports.iter_detailed_time()
+        self.assertEqual(next(rows).first_name, "Kim")
+        self.assertEqual([path for path in self.requests if path.startswith('/api/v2/time_entries')], ['/api/v2/time_entries?page=1&per_page=100'])
+        self.assertEqual([row.first_name for row in rows], ["Bob", "Jane", "Kim"])
+        self.assertEqual(len([path for path in self.requests if path.startswith('/api/v2/time_entries')]), 4)
+
+        self.assertEqual([row.billable for row in self.reports.iter_detailed_time(show='Non-Billable Hours', buffer_size=2)], ['False'])
+
+        # closing early stops the prefetching thread
+        threads = threading.active_count()
+        rows = self.reports.iter_detailed_time(buffer_size=1)
+        next(rows)
+        rows.close()
+        self.assertEqual(threading.active_count(), threads)
+
+        httpretty.reset()
+
+    def test_users_by_id(self):
+        users = self.reports.users_by_id([1782959, 1782974])
+
+        self.assertEqual(sorted(users.keys()), [1782959, 1782974])
+        self.assertEqual(users[1782974].first_name, "Jane")
+        self.assertEqual(self.reports.users_by_id([1782884])[1782884].first_name, "Bob")
+        self.assertEqual(len(self.requests), 2)
+
+        httpretty.reset()
+
+    def test_reference_cache_off(self):
+        reports = Reports('https://api.harvestapp.com/api/v2', PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN'), reference_cache=None)
+        self.assertIsNone(reports.reference_cache)
+        self.assertIsNotNone(self.reports.reference_cache)
+
+        # without it users are looked up for every report
+        self.assertEqual([entry.first_name for entry in reports.detailed_time().detailed_time_entries], ["Kim", "Bob", "Jane", "Kim"])
+        self.requests.clear()
+        reports.detailed_time()
+        self.assertEqual([path.split('?')[0] for path in self.requests], ['/api/v2/time_entries', '/api/v2/users', '/api/v2/users/1782974'])
+
+        httpretty.reset()
+
+    def test_users_by_id_update_user(self):
+        kim_married_dict = dict(kim_allen_dict, last_name="Powell", roles=["Manager"])
+        httpretty.register_uri(httpretty.PATCH, "https://api.harvestapp.com/api/v2/users/1782959", body=json.dumps(kim_married_dict))
+        httpretty.register_uri(httpretty.GET, "https://api.harvestapp.com/api/v2/users/1782959", body=json.dumps(kim_married_dict))
+
+        self.assertEqual([entry.last_name for entry in self.reports.detailed_time().detailed_time_entries], ["Allen", "Powell", "Doe", "Allen"])
+
+        # the swept users are the reference cache's, which update_user invalidates
+        self.reports.update_user(1782959, last_name="Powell", roles=["Manager"])
+        self.requests.clear()
+        self.assertEqual([(entry.first_name, entry.last_name, entry.roles) for entry in self.reports.detailed_time().detailed_time_entries], [("Kim", "Powell", ["Manager"]), ("Bob", "Powell", ["Founder", "CEO"]), ("Jane", "Doe", ["Developer"]), ("Kim", "Powell", ["Manager"])])
+        self.assertEqual([path.split('?')[0] for path in self.requests], ['/api/v2/time_entries'])
+
+        httpretty.reset()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+# Copyright 2020 Bradbase
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, sys
+import unittest
+import httpretty
+import warnings
+from dacite import from_dict
+import json
+import requests
+
+sys.path.insert(0, sys.path[0]+"/..")
+
+import harvest
+from harvest.harvestdataclasses import *
+from harvest.ratelimit import SlidingWindowRateLimiter
+from harvest.retry import RetryPolicy, retry_after_seconds
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+from .ratelimit import FakeClock
+
+class TestRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeClock()
+        self.rate_limiter = SlidingWindowRateLimiter(100, 15, clock=self.fake.clock, sleep=self.fake.sleep)
+        self.retry_policy = RetryPolicy(idempotent_retries=3, non_idempotent_retries=1, random=lambda: 1.0, sleep=self.fake.sleep)
+        personal_access_token = PersonalAccessToken('ACCOUNT_NUMBER', 'PERSONAL_ACCESS_TOKEN')
+        self.harvest = harvest.Harvest('https://api.harvestapp.com/api/v2', personal_access_token, rate_limiter=self.rate_limiter, retry_policy=self.retry_policy)
+        warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*") # There's a bug in httpretty ATM.
+        httpretty.enable()
+
+    def teardown(self):
+        httpretty.reset()
+        httpretty.disable()
+
+    # responses is a list of (status, headers, body), the last is repeated
+    def register(self, method, uri, responses):
+        self.requests = 0
+
+        def callback(request, uri, response_headers):
+            status, headers, body = responses[min(self.requests, len(responses) - 1)]
+            self.requests += 1
+            response_headers.update(headers)
+            return [status, response_headers, json.dumps(body)]
+
+        httpretty.reset()
+        httpretty.register_uri(method, uri, body=callback)
+
+    def test_retry_after(self):
+        company_dict = {"name": "API Examples", "is_active": True}
+        self.register(httpretty.GET, "https://api.harvestapp.com/api/v2/company", [
+                (429, {'Retry-After': '7'}, {"message": "Too Many Requests"}),
+                (503, {}, {"message": "Service Unavailable"}),
+                (200, {}, company_dict)
+            ])
+
+        self.assertEqual(self.harvest.company(), from_dict(data_class=Company, data=company_dict))
+        self.assertEqual(self.requests, 3)
+
+        # Retry-After pauses the shared limiter, the 503 backs off 0.5 * 2 ** 1
+        self.assertEqual(self.fake.sleeps, [7.0, 1.0])
+
+        httpretty.reset()
+
+    def test_idempotent_budget(self):
+        self.register(httpretty.GET, "https://api.harvestapp.com/api/v2/company", [(500, {}, {"message": "Internal Server Error"})])
+
+        # the error body isn't decoded into an empty Company
+        with self.assertRaises(harvest.HarvestError) as raised:
+            self.harvest.company()
+        self.assertIn('500', str(raised.exception))
+        self.assertIn('Internal Server Error', str(raised.exception))
+        self.assertEqual(self.requests, 4)
+        self.assertEqual(self.fake.sleeps, [0.5, 1.0, 2.0])
+
+        httpretty.reset()
+
+    def test_non_idempotent(self):
+        role_dict = {"id": 617630, "name": "Sales", "user_ids": [], "created_at": "2017-06-26T22:34:41Z", "updated_at": "2017-06-26T22:34:52Z"}
+
+        # a POST which may have been acted on is not retried
+        self.register(httpretty.POST, "https://api.harvestapp.com/api/v2/roles", [(500, {}, {"message": "Internal Server Error"}), (201, {}, role_dict)])
+        self.harvest.create_role(name="Sales")
+        self.assertEqual(self.requests, 1)
+
+        # one which was refused is, up to its own budget
+        self.register(httpretty.POST, "https://api.harvestapp.com/api/v2/roles", [(429, {}, {"message": "Too Many Requests"}), (201, {}, role_dict)])
+        self.assertEqual(self.harvest.create_role(name="Sales"), from_dict(data_class=Role, data=role_dict))
+        self.assertEqual(self.requests, 2)
+
+        self.register(httpretty.POST, "https://api.harvestapp.com/api/v2/roles", [(429, {}, {"message": "Too Many Requests"})])
+        with self.assertRaises(harvest.HarvestError):
+            self.harvest.create_role(name="Sales")
+        self.assertEqual(self.requests, 2)
+
+        httpretty.reset()
+
+    def test_non_idempotent_connect_failed(self):
+        refused = requests.exceptions.ConnectionError(MaxRetryError(None, '/roles', NewConnectionError(None, 'Connection refused')))
+        reset = requests.exceptions.ConnectionError(ProtocolError('Connection aborted.', ConnectionResetError()))
+
+        # nothing was sent when the connection was refused, a reset may have been acted on
+        self.assertTrue(self.retry_policy.should_retry('POST', 0, exception=refused))
+        self.assertTrue(self.retry_policy.should_retry('POST', 0, exception=requests.exceptions.ConnectTimeout()))
+        self.assertFalse(self.retry_policy.should_retry('POST', 0, exception=reset))
+        self.assertFalse(self.retry_policy.should_retry('POST', 1, exception=refused))
+        self.assertTrue(self.retry_policy.should_retry('GET', 0, exception=reset))
+
+    def test_retry_after_seconds(self):
+        class Response(object):
+            def __init__(self, headers):
+                self.headers = headers
+
+        self.assertEqual(retry_after_seconds(Response({})), None)
+        self.assertEqual(retry_after_seconds(Response({'Retry-After': '12'})), 12.0)
+        self.assertEqual(retry_after_seconds(Response({'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})), 0.0)
+        self.assertEqual(retry_after_seconds(Response({'Retry-After': 'soon'})), None)
+
+if __name__ == '__main__':
+    unittest.main()